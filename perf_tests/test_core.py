@@ -0,0 +1,52 @@
+import time
+from array import array
+
+from perf_tests.util import scope_sorter
+from pytest_order.graph import ConstraintGraph
+from pytest_order.item import NO_ORDER
+
+
+def test_performance_integer_core():
+    """Test the performance of sorting item indexes without
+    a pytest session, using 100 modules with 1000 tests each,
+    where every tenth test is placed after a later test."""
+    nr_items = 100000
+    orders = array("q", [NO_ORDER]) * nr_items
+    module_keys = array("i", (index // 1000 for index in range(nr_items)))
+    graph = ConstraintGraph(nr_items)
+    for item in range(0, nr_items, 10):
+        graph.add_edge(item + 5, item, move_after=True)
+    items = list(range(nr_items))
+
+    start_time = time.time()
+    sorted_items = scope_sorter(graph, orders, module_keys).sort_items()
+    elapsed = (time.time() - start_time) / nr_items * 1000
+    print(f"\nTime per test: {elapsed:.4f} ms")
+
+    positions = {item: position for position, item in enumerate(sorted_items)}
+    assert sorted(sorted_items) == items
+    assert all(positions[item + 5] < positions[item] for item in range(0, nr_items, 10))
+    assert elapsed < 0.02
+
+
+def test_performance_satisfied_constraints():
+    """Test the performance of sorting 100000 item indexes, where each
+    tenth test is placed after the previous test, which is already
+    satisfied by the collection order."""
+    nr_items = 100000
+    orders = array("q", [NO_ORDER]) * nr_items
+    module_keys = array("i", (index // 1000 for index in range(nr_items)))
+    graph = ConstraintGraph(nr_items)
+    for item in range(1, nr_items, 10):
+        graph.add_edge(item - 1, item, move_after=True)
+    items = list(range(nr_items))
+
+    start_time = time.time()
+    sorter = scope_sorter(graph, orders, module_keys)
+    sorted_items = sorter.sort_items()
+    elapsed = (time.time() - start_time) / nr_items * 1000
+    print(f"\nTime per test: {elapsed:.4f} ms")
+
+    assert sorted_items == items
+    assert sorter.strategy == "already in order"
+    assert elapsed < 0.002
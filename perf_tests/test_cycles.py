@@ -0,0 +1,45 @@
+from textwrap import dedent
+from unittest import mock
+
+import pytest
+
+from perf_tests.util import TimedSorter
+
+pytest_plugins = ["pytester"]
+
+
+@pytest.fixture
+def fixture_path_cycles(testdir):
+    for i_mod in range(10):
+        test_name = testdir.tmpdir.join(f"test_cycles_perf{i_mod}.py")
+        test_contents = "import pytest\n"
+        for i in range(100):
+            test_contents += dedent(
+                f"""
+                @pytest.mark.order(after="test_{(i + 1) % 100}")
+                def test_{i}():
+                    assert True
+                """
+            )
+        test_name.write(test_contents)
+    yield testdir
+
+
+@mock.patch("pytest_order.plugin.Sorter", TimedSorter)
+def test_performance_cycles(fixture_path_cycles):
+    """Test performance of the cycle diagnostics for modules
+    where all tests form a single constraint cycle."""
+    TimedSorter.nr_marks = 1000
+    result = fixture_path_cycles.runpytest("--quiet")
+    result.stdout.fnmatch_lines(["WARNING: constraint cycle: *"])
+    assert TimedSorter.elapsed < 0.15
+
+
+@mock.patch("pytest_order.plugin.Sorter", TimedSorter)
+def test_performance_minimal_cycle_breaking(fixture_path_cycles):
+    """Test performance of breaking the constraint cycles
+    using a minimal set of ignored markers."""
+    TimedSorter.nr_marks = 1000
+    result = fixture_path_cycles.runpytest("--quiet", "--minimal-cycle-breaking")
+    result.stdout.fnmatch_lines(["WARNING: constraint cycle: *"])
+    assert TimedSorter.elapsed < 0.15
@@ -0,0 +1,76 @@
+import time
+from textwrap import dedent
+
+import pytest
+
+from pytest_order.durations import DurationHistory
+from pytest_order.sorter import Sorter
+
+pytest_plugins = ["pytester"]
+
+
+@pytest.fixture
+def fixture_path_durations(testdir):
+    for i_mod in range(10):
+        test_name = testdir.tmpdir.join(f"test_performance{i_mod}.py")
+        test_contents = "import pytest\n"
+        for i in range(1000):
+            # every tenth test is part of a relative chain
+            marker = f'@pytest.mark.order(after="test_{i - 10}")' if i % 10 == 0 else ""
+            test_contents += dedent(
+                f"""
+                {marker}
+                def test_{i}():
+                    assert True
+                """
+            )
+        test_name.write(test_contents)
+    yield testdir
+
+
+def test_performance_duration_history(tmpdir):
+    """Test performance of saving and loading the durations of many tests."""
+    path = str(tmpdir.join("durations.bin"))
+    history = DurationHistory(path)
+    for i in range(100000):
+        history.add(f"tests/test_module{i // 100}.py::test_{i % 100}", i / 1000)
+    start_time = time.time()
+    history.save()
+    save_time = time.time() - start_time
+    start_time = time.time()
+    history = DurationHistory(path)
+    load_time = time.time() - start_time
+    print(
+        f"\nTime per test: {save_time / len(history) * 1000:.5f} ms saved, "
+        f"{load_time / len(history) * 1000:.5f} ms loaded"
+    )
+    assert len(history) == 100000
+    duration = history.get("tests/test_module999.py::test_99")
+    assert duration is not None
+    assert duration.mean == 99.999
+    assert save_time < 0.1
+    assert load_time < 0.1
+
+
+def test_performance_longest_first(fixture_path_durations):
+    """Test performance of reordering the free tests by their duration."""
+    items = fixture_path_durations.getitems(fixture_path_durations.tmpdir)
+    config = items[0].config
+    history = DurationHistory(str(fixture_path_durations.tmpdir.join("durations.bin")))
+    for index, item in enumerate(items):
+        history.add(item.nodeid, index % 97 / 10)
+    start_time = time.time()
+    Sorter(config, items).sort_items()
+    sort_time = time.time() - start_time
+    config.option.order_by_duration = "longest-first"
+    start_time = time.time()
+    sorted_items = Sorter(config, items, duration_history=history).sort_items()
+    duration_time = time.time() - start_time
+    print(
+        f"\nTime per test: {sort_time / len(items) * 1000:.4f} ms sorted, "
+        f"{duration_time / len(items) * 1000:.4f} ms sorted by duration"
+    )
+    # the first test starts the relative chain and keeps its position
+    assert sorted_items[0].nodeid == "test_performance0.py::test_0"
+    assert sorted_items[1].nodeid == "test_performance0.py::test_96"
+    assert duration_time < sort_time * 2
@@ -0,0 +1,48 @@
+from textwrap import dedent
+from unittest import mock
+
+import pytest
+
+from perf_tests.util import TimedSorter
+
+pytest_plugins = ["pytester"]
+
+
+@pytest.fixture
+def fixture_path_common_names(testdir):
+    for i_mod in range(100):
+        test_name = testdir.tmpdir.join(f"test_labels_perf{i_mod}.py")
+        test_contents = "import pytest\n"
+        for i in range(5):
+            test_contents += dedent(
+                f"""
+                class TestClass{i}:
+                    @pytest.mark.order(after="test_setup")
+                    def test_create(self):
+                        assert True
+
+                    def test_setup(self):
+                        assert True
+                """
+            )
+        test_contents += dedent(
+            """
+            @pytest.mark.order(after="test_setup")
+            def test_create():
+                assert True
+
+            def test_setup():
+                assert True
+            """
+        )
+        test_name.write(test_contents)
+    yield testdir
+
+
+@mock.patch("pytest_order.plugin.Sorter", TimedSorter)
+def test_performance_common_names(fixture_path_common_names):
+    """Test performance of after markers using test names that exist
+    in all modules and classes."""
+    TimedSorter.nr_marks = 600
+    fixture_path_common_names.runpytest("--quiet")
+    assert TimedSorter.elapsed < 0.15
@@ -0,0 +1,174 @@
+import tracemalloc
+from textwrap import dedent
+from unittest import mock
+
+import pytest
+
+from perf_tests.util import MemorySorter, bare_item
+from pytest_order.graph import ConstraintGraph
+
+pytest_plugins = ["pytester"]
+
+NR_MODULES = 10
+NR_VARIANTS = 500
+NR_DEPENDENT_VARIANTS = 50
+NR_CONSTRAINTS = NR_MODULES * NR_VARIANTS * NR_DEPENDENT_VARIANTS
+
+
+@pytest.fixture
+def fixture_path_parametrized(testdir):
+    """Modules with a heavily parametrized test, and a parametrized test
+    placed after all of its variants."""
+    for i_mod in range(NR_MODULES):
+        test_name = testdir.tmpdir.join(f"test_memory{i_mod}.py")
+        test_name.write(
+            dedent(
+                f"""
+                import pytest
+
+                @pytest.mark.parametrize("x", range({NR_VARIANTS}))
+                def test_a(x):
+                    assert True
+
+                @pytest.mark.order(after="test_a")
+                @pytest.mark.parametrize("x", range({NR_DEPENDENT_VARIANTS}))
+                def test_b(x):
+                    assert True
+                """
+            )
+        )
+    testdir.tmpdir.join("conftest.py").write(
+        dedent(
+            """
+            import sys
+
+            def peak_rss():
+                # on Linux, ru_maxrss includes the memory of the parent
+                # process before exec, but the high water mark does not
+                try:
+                    with open("/proc/self/status") as f:
+                        for line in f:
+                            if line.startswith("VmHWM:"):
+                                return int(line.split()[1])
+                except OSError:
+                    pass
+                import resource
+
+                maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                return maxrss // 1024 if sys.platform == "darwin" else maxrss
+
+            def pytest_collection_finish(session):
+                with open("maxrss.txt", "w") as f:
+                    f.write(str(peak_rss()))
+            """
+        )
+    )
+    yield testdir
+
+
+@mock.patch("pytest_order.plugin.Sorter", MemorySorter)
+def test_sort_peak_memory(fixture_path_parametrized):
+    """Test the peak memory allocated while sorting the collected tests,
+    where each dependent test variant creates a constraint for each
+    variant it is placed after."""
+    MemorySorter.nr_items = NR_MODULES * (NR_VARIANTS + NR_DEPENDENT_VARIANTS)
+    fixture_path_parametrized.runpytest("--quiet", "--collect-only")
+    assert MemorySorter.peak / NR_CONSTRAINTS < 400
+
+
+def test_collection_peak_rss(fixture_path_parametrized):
+    """Test the peak RSS of a collection with sorting against the same
+    collection without the plugin, as measured in a separate process."""
+    pytest.importorskip("resource")
+    maxrss_path = fixture_path_parametrized.tmpdir.join("maxrss.txt")
+    fixture_path_parametrized.runpytest_subprocess(
+        "--quiet", "--collect-only", "-p", "no:pytest_order"
+    )
+    unsorted_rss = int(maxrss_path.read())
+    fixture_path_parametrized.runpytest_subprocess("--quiet", "--collect-only")
+    sorted_rss = int(maxrss_path.read())
+    print(f"\nPeak RSS of collection: {unsorted_rss} -> {sorted_rss} kB")
+    assert (sorted_rss - unsorted_rss) * 1024 / NR_CONSTRAINTS < 400
+
+
+class DictItem:
+    """Item as implemented before using slots."""
+
+    def __init__(self, item, collection_index=0):
+        self.item = item
+        self.nr_rel_items = 0
+        self.order = None
+        self._node_id = None
+        self.collection_index = collection_index
+
+
+class DictRelativeMark:
+    """RelativeMark as implemented before using slots."""
+
+    def __init__(self, item, item_to_move, move_after):
+        self.item = item
+        self.item_to_move = item_to_move
+        self.move_after = move_after
+
+
+class MarkGraph:
+    """Constraint graph as implemented before using edge arrays."""
+
+    def __init__(self):
+        self.in_edges = {}
+        self.out_edges = {}
+        self.edges = set()
+
+    def add_mark(self, mark):
+        edge = (mark.item, mark.item_to_move, mark.move_after)
+        if edge in self.edges:
+            return
+        self.edges.add(edge)
+        self.in_edges.setdefault(mark.item_to_move, []).append(mark)
+        self.out_edges.setdefault(mark.item, []).append(mark)
+
+
+def allocated_per_object(factory, count=10000):
+    objects = [None] * count
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    for index in range(count):
+        objects[index] = factory(index)
+    allocated = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return allocated / count
+
+
+def test_item_memory():
+    dict_size = allocated_per_object(lambda index: DictItem(None, index))
+    slots_size = allocated_per_object(bare_item)
+    print(f"\nMemory per item: {dict_size:.0f} -> {slots_size:.0f} bytes")
+    assert slots_size < dict_size
+
+
+def allocated_per_edge(add_edge, count=10000):
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    for index in range(count):
+        add_edge(index)
+    allocated = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return allocated / count
+
+
+def test_mark_memory():
+    count = 10000
+    items = [bare_item(index) for index in range(count + 1)]
+    mark_graph = MarkGraph()
+    mark_size = allocated_per_edge(
+        lambda index: mark_graph.add_mark(
+            DictRelativeMark(items[index], items[index + 1], True)
+        ),
+        count,
+    )
+    graph = ConstraintGraph(count + 1)
+    edge_size = allocated_per_edge(
+        lambda index: graph.add_edge(index, index + 1, move_after=True), count
+    )
+    print(f"\nMemory per mark: {mark_size:.0f} -> {edge_size:.0f} bytes")
+    assert edge_size < mark_size
@@ -0,0 +1,36 @@
+from textwrap import dedent
+from unittest import mock
+
+import pytest
+
+from perf_tests.util import TimedSorter
+
+pytest_plugins = ["pytester"]
+
+
+@pytest.fixture
+def fixture_path_few_marked_modules(testdir):
+    for i_mod in range(500):
+        test_name = testdir.tmpdir.join(f"test_performance{i_mod}.py")
+        test_contents = "import pytest\n"
+        for i in range(20):
+            # only 2% of the modules use markers
+            marker = "@pytest.mark.order(-1)" if i_mod % 50 == 0 and i == 0 else ""
+            test_contents += dedent(
+                f"""
+                {marker}
+                def test_{i}():
+                    assert True
+                """
+            )
+        test_name.write(test_contents)
+    yield testdir
+
+
+@mock.patch("pytest_order.plugin.Sorter", TimedSorter)
+def test_performance_few_marked_modules(fixture_path_few_marked_modules):
+    """Test performance of module scope sorting if most modules have
+    no markers and are passed through unchanged."""
+    TimedSorter.nr_marks = 10000
+    fixture_path_few_marked_modules.runpytest("--quiet", "--order-scope=module")
+    assert TimedSorter.elapsed < 0.01
@@ -0,0 +1,43 @@
+import time
+from array import array
+
+from perf_tests.util import scope_sorter
+from pytest_order.graph import ConstraintGraph, _LabeledList
+from pytest_order.item import NO_ORDER
+
+
+def test_performance_moves_to_one_anchor():
+    """Test the performance of moving 40000 items directly after the same
+    anchor item, which uses up the free labels next to the anchor."""
+    nr_items = 40000
+    order = _LabeledList(list(range(nr_items)))
+
+    start_time = time.time()
+    for item in range(1, nr_items):
+        order.move_after(item, 0)
+    elapsed = (time.time() - start_time) / nr_items * 1000
+    print(f"\nTime per move: {elapsed:.4f} ms")
+
+    items = order.items()
+    assert items == [0, *range(nr_items - 1, 0, -1)]
+    assert all(order.is_before(item, other) for item, other in zip(items, items[1:]))
+    assert elapsed < 0.02
+
+
+def test_performance_before_one_test():
+    """Test the performance of sorting 40000 item indexes, where all tests
+    are placed before the first test."""
+    nr_items = 40000
+    orders = array("q", [NO_ORDER]) * nr_items
+    module_keys = array("i", [0]) * nr_items
+    graph = ConstraintGraph(nr_items)
+    for item in range(1, nr_items):
+        graph.add_edge(0, item, move_after=False)
+
+    start_time = time.time()
+    sorted_items = scope_sorter(graph, orders, module_keys).sort_items()
+    elapsed = (time.time() - start_time) / nr_items * 1000
+    print(f"\nTime per test: {elapsed:.4f} ms")
+
+    assert sorted_items == [*range(nr_items - 1, 0, -1), 0]
+    assert elapsed < 0.04
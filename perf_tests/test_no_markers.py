@@ -0,0 +1,36 @@
+import time
+from textwrap import dedent
+
+import pytest
+
+from pytest_order.sorter import has_ordering_markers
+
+pytest_plugins = ["pytester"]
+
+
+@pytest.fixture
+def fixture_path_no_markers(testdir):
+    for i_mod in range(10):
+        test_name = testdir.tmpdir.join(f"test_performance{i_mod}.py")
+        test_contents = "import pytest\n"
+        for i in range(1000):
+            test_contents += dedent(
+                f"""
+                def test_{i}():
+                    assert True
+                """
+            )
+        test_name.write(test_contents)
+    yield testdir
+
+
+def test_performance_no_markers(fixture_path_no_markers):
+    """Test performance of checking a session without any ordering markers,
+    which is the only work done by the plugin in this case."""
+    items = fixture_path_no_markers.getitems(fixture_path_no_markers.tmpdir)
+    config = items[0].config
+    start_time = time.time()
+    assert not has_ordering_markers(config, items)
+    elapsed = (time.time() - start_time) / len(items) * 1000
+    print(f"\nTime per test: {elapsed:.4f} ms")
+    assert elapsed < 0.005
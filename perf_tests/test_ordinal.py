@@ -1,8 +1,13 @@
-from unittest import mock
+import time
+from array import array
 from textwrap import dedent
+from unittest import mock
 
 import pytest
-from perf_tests.util import TimedSorter
+
+from perf_tests.util import TimedSorter, scope_sorter
+from pytest_order.graph import ConstraintGraph
+from pytest_order.item import NO_ORDER
 
 pytest_plugins = ["pytester"]
 
@@ -29,3 +34,27 @@ def test_performance_ordinal(fixture_path_ordinal):
     TimedSorter.nr_marks = 1000
     fixture_path_ordinal.runpytest("--quiet")
     assert TimedSorter.elapsed < 0.02
+
+
+@pytest.mark.parametrize("group_scope", ["session", "class"])
+def test_performance_ordinal_core(group_scope):
+    """Test the performance of sorting 100000 item indexes with ordinals
+    and without relative markers, using 100 modules with 10 classes each,
+    where every second test has an ordinal."""
+    nr_items = 100000
+    orders = array("q", (NO_ORDER if i % 2 else 50 - i % 100 for i in range(nr_items)))
+    module_keys = array("i", (index // 1000 for index in range(nr_items)))
+    class_keys = array("i", (index // 100 for index in range(nr_items)))
+    graph = ConstraintGraph(nr_items)
+    items = list(range(nr_items))
+
+    start_time = time.time()
+    sorter = scope_sorter(
+        graph, orders, module_keys, class_keys, order_group_scope=group_scope
+    )
+    sorted_items = sorter.sort_items()
+    elapsed = (time.time() - start_time) / nr_items * 1000
+    print(f"\nTime per test: {elapsed:.4f} ms")
+
+    assert sorted(sorted_items) == items
+    assert elapsed < 0.005
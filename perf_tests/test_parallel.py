@@ -0,0 +1,52 @@
+import os
+import time
+from textwrap import dedent
+
+import pytest
+
+from pytest_order.plugin import sort_items
+
+pytest_plugins = ["pytester"]
+
+
+@pytest.fixture
+def fixture_path_many_modules(testdir):
+    for i_mod in range(20):
+        test_name = testdir.tmpdir.join(f"test_performance{i_mod}.py")
+        test_contents = "import pytest\n"
+        for i in range(500):
+            test_contents += dedent(
+                f"""
+                @pytest.mark.order(before="test_{(i * 7 + 3) % 500}")
+                def test_{i}():
+                    assert True
+                """
+            )
+        test_name.write(test_contents)
+    yield testdir
+
+
+def sorted_node_ids(testdir, workers):
+    items = testdir.getitems(testdir.tmpdir)
+    config = items[0].config
+    config.option.order_scope = "module"
+    config.option.order_workers = workers
+    start_time = time.time()
+    sort_items(config, items)
+    return [item.nodeid for item in items], time.time() - start_time
+
+
+@pytest.mark.skipif(
+    (os.cpu_count() or 1) < 4, reason="needs at least 4 CPUs to be faster"
+)
+def test_performance_parallel_scope_groups(fixture_path_many_modules):
+    """Test performance of sorting the scope groups in parallel
+    compared to sorting them one after the other."""
+    node_ids, sort_time = sorted_node_ids(fixture_path_many_modules, 1)
+    parallel_node_ids, parallel_time = sorted_node_ids(fixture_path_many_modules, 4)
+    print(
+        f"\nTime per test: {sort_time / len(node_ids) * 1000:.4f} ms sequential, "
+        f"{parallel_time / len(node_ids) * 1000:.4f} ms parallel"
+    )
+    assert parallel_node_ids == node_ids
+    assert parallel_time < sort_time
@@ -0,0 +1,111 @@
+import time
+from textwrap import dedent
+
+import pytest
+
+from pytest_order.plugin import sort_items
+
+pytest_plugins = ["pytester"]
+
+
+@pytest.fixture
+def fixture_path_cached(testdir):
+    for i_mod in range(10):
+        test_name = testdir.tmpdir.join(f"test_performance{i_mod}.py")
+        test_contents = "import pytest\n"
+        for i in range(1000):
+            test_contents += dedent(
+                f"""
+                @pytest.mark.order(after="test_{i + 1}")
+                def test_{i}():
+                    assert True
+                """
+                if i < 999
+                else f"""
+                def test_{i}():
+                    assert True
+                """
+            )
+        test_name.write(test_contents)
+    yield testdir
+
+
+def test_performance_cached_order(fixture_path_cached):
+    """Test performance of applying the cached order compared
+    to sorting the items with many relative markers."""
+    items = fixture_path_cached.getitems(fixture_path_cached.tmpdir)
+    config = items[0].config
+    config.option.order_cache = True
+    start_time = time.time()
+    sort_items(config, items)
+    sort_time = time.time() - start_time
+    sorted_items = list(items)
+
+    items = fixture_path_cached.getitems(fixture_path_cached.tmpdir)
+    config = items[0].config
+    config.option.order_cache = True
+    start_time = time.time()
+    sort_items(config, items)
+    cached_time = time.time() - start_time
+    print(
+        f"\nTime per test: {sort_time / len(items) * 1000:.4f} ms sorted, "
+        f"{cached_time / len(items) * 1000:.4f} ms cached"
+    )
+    assert [item.nodeid for item in items] == [item.nodeid for item in sorted_items]
+    assert cached_time < sort_time / 2
+
+
+def test_performance_cached_scope_groups(fixture_path_cached):
+    """Test performance of reusing the cached order of unchanged
+    scope groups compared to sorting them."""
+    items = fixture_path_cached.getitems(fixture_path_cached.tmpdir)
+    config = items[0].config
+    config.option.order_cache = True
+    config.option.order_scope = "module"
+    start_time = time.time()
+    sort_items(config, items)
+    sort_time = time.time() - start_time
+    sorted_items = list(items)
+
+    items = fixture_path_cached.getitems(fixture_path_cached.tmpdir)
+    config = items[0].config
+    config.option.order_cache = True
+    config.option.order_scope = "module"
+    # only the cached scope groups shall be used
+    config.cache.set("pytest-order/plan", None)
+    start_time = time.time()
+    sort_items(config, items)
+    cached_time = time.time() - start_time
+    print(
+        f"\nTime per test: {sort_time / len(items) * 1000:.4f} ms sorted, "
+        f"{cached_time / len(items) * 1000:.4f} ms cached"
+    )
+    assert [item.nodeid for item in items] == [item.nodeid for item in sorted_items]
+    # the markers are still collected to validate the cached groups
+    assert cached_time < sort_time
+
+
+def test_performance_order_plan(fixture_path_cached):
+    """Test performance of applying an exported order plan
+    compared to sorting the items."""
+    plan_path = str(fixture_path_cached.tmpdir.join("order.plan"))
+    items = fixture_path_cached.getitems(fixture_path_cached.tmpdir)
+    config = items[0].config
+    config.option.order_export = plan_path
+    start_time = time.time()
+    sort_items(config, items)
+    sort_time = time.time() - start_time
+    sorted_items = list(items)
+
+    items = fixture_path_cached.getitems(fixture_path_cached.tmpdir)
+    config = items[0].config
+    config.option.order_plan = plan_path
+    start_time = time.time()
+    sort_items(config, items)
+    plan_time = time.time() - start_time
+    print(
+        f"\nTime per test: {sort_time / len(items) * 1000:.4f} ms sorted "
+        f"and exported, {plan_time / len(items) * 1000:.4f} ms planned"
+    )
+    assert [item.nodeid for item in items] == [item.nodeid for item in sorted_items]
+    assert plan_time < sort_time / 5
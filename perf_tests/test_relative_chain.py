@@ -0,0 +1,39 @@
+from textwrap import dedent
+from unittest import mock
+
+import pytest
+
+from perf_tests.util import TimedSorter
+
+pytest_plugins = ["pytester"]
+
+
+@pytest.fixture
+def fixture_path_relative_chain(testdir):
+    test_name = testdir.tmpdir.join("test_relative_chain_perf.py")
+    test_contents = "import pytest\n"
+    for i in range(999):
+        test_contents += dedent(
+            f"""
+            @pytest.mark.order(after="test_{i + 1}")
+            def test_{i}():
+                assert True
+            """
+        )
+    test_contents += dedent(
+        """
+        def test_999():
+            assert True
+        """
+    )
+    test_name.write(test_contents)
+    yield testdir
+
+
+@mock.patch("pytest_order.plugin.Sorter", TimedSorter)
+def test_performance_relative_chain(fixture_path_relative_chain):
+    """Test performance of a long chain of after markers in reverse
+    collection order, where each test has to wait for the next one."""
+    TimedSorter.nr_marks = 999
+    fixture_path_relative_chain.runpytest("--quiet")
+    assert TimedSorter.elapsed < 0.15
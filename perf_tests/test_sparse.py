@@ -0,0 +1,30 @@
+import time
+from array import array
+
+from perf_tests.util import scope_sorter
+from pytest_order.graph import ConstraintGraph
+from pytest_order.item import NO_ORDER
+
+
+def test_performance_sparse_ordering():
+    """Test the performance of sparse ordering in a single scope with
+    100000 tests, where every thousandth test has an ordinal, with the
+    ordinals spaced widely apart at the start and at the end."""
+    nr_items = 100000
+    orders = array("q", [NO_ORDER]) * nr_items
+    for item in range(0, nr_items, 1000):
+        orders[item] = item // 2 if item % 2000 else -item // 2 - 1
+    module_keys = array("i", [0]) * nr_items
+    graph = ConstraintGraph(nr_items)
+    items = list(range(nr_items))
+
+    start_time = time.time()
+    sorter = scope_sorter(graph, orders, module_keys, sparse_ordering=True)
+    sorted_items = sorter.sort_items()
+    elapsed = (time.time() - start_time) / nr_items * 1000
+    print(f"\nTime per test: {elapsed:.4f} ms")
+
+    assert sorted(sorted_items) == items
+    assert sorted_items.index(1000) == 500
+    assert sorted_items.index(0) == nr_items - 1
+    assert elapsed < 0.005
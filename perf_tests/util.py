@@ -1,6 +1,13 @@
 import time
+import tracemalloc
+from typing import cast
 
-from pytest_order.sorter import Sorter
+from _pytest.config import Config
+from pytest import Function
+
+from pytest_order.item import Item, ItemIndex
+from pytest_order.settings import Settings
+from pytest_order.sorter import ScopeSorter, Sorter
 
 
 class TimedSorter(Sorter):
@@ -14,3 +21,50 @@ class TimedSorter(Sorter):
         self.__class__.elapsed = (time.time() - start_time) / self.nr_marks * 1000
         print(f"\nTime per test: {self.__class__.elapsed:.3f} ms")
         return items
+
+
+class MemorySorter(Sorter):
+    peak = 0
+    nr_items = 1000
+
+    def __init__(self, *args, **kwargs):
+        tracemalloc.start()
+        super().__init__(*args, **kwargs)
+
+    def sort_items(self):
+        items = super().sort_items()
+        self.__class__.peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"\nPeak memory per test: {self.peak / self.nr_items:.0f} bytes")
+        return items
+
+
+def bare_item(collection_index: int) -> Item:
+    """Return an item without a test function, as used for memory tests."""
+    return Item(cast(Function, None), collection_index)
+
+
+class OptionConfig:
+    """Stands in for the pytest config with the given option values."""
+
+    def __init__(self, **options):
+        self.options = options
+
+    def getoption(self, name):
+        return self.options.get(name)
+
+    def getini(self, name):
+        raise ValueError(name)
+
+
+def scope_sorter(graph, orders, module_keys, class_keys=None, **options):
+    """
+    Return a sorter for all item indexes in a single order scope without
+    a pytest session, with the settings for the given command line options.
+    """
+    settings = Settings(cast(Config, OptionConfig(**options)))
+    if class_keys is None:
+        class_keys = module_keys
+    index = ItemIndex(orders, module_keys, class_keys)
+    items = list(range(len(orders)))
+    return ScopeSorter(settings, items, graph.subgraph(items), index)
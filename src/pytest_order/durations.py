@@ -0,0 +1,160 @@
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Callable
+from typing import Any, NamedTuple, Optional
+
+from _pytest.config import Config
+
+DURATIONS_FILE = "durations.bin"
+# the file starts with a magic number, the format version,
+# the number of entries and the size of the node id block
+HEADER = struct.Struct("<4sIII")
+MAGIC = b"PTOD"
+VERSION = 1
+# the weight of a new duration in the exponentially weighted mean
+SMOOTHING = 0.3
+
+
+class Duration(NamedTuple):
+    """The recorded duration of a test in seconds."""
+
+    mean: float
+    variance: float
+    runs: int
+
+
+class DurationHistory:
+    """
+    Holds the durations of the tests in previous runs as an exponentially
+    weighted mean and variance together with the number of runs.
+    The values are held in parallel arrays indexed by the position of the
+    node id, and are saved as a binary file in the pytest cache, with the
+    node ids in a single block followed by the raw arrays, so that they
+    can be loaded without parsing each entry.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.node_ids: list[str] = []
+        self.positions: dict[str, int] = {}
+        self.means = array("d")
+        self.variances = array("d")
+        self.runs = array("I")
+        self.load()
+
+    @classmethod
+    def for_config(cls, config: Config) -> Optional["DurationHistory"]:
+        """Return the history in the pytest cache, if the cache is enabled."""
+        cache = getattr(config, "cache", None)
+        if cache is None:
+            return None
+        # Cache.mkdir has been added in pytest 7, replacing Cache.makedir
+        mkdir = getattr(cache, "mkdir", None) or cache.makedir
+        return cls(os.path.join(str(mkdir("pytest-order")), DURATIONS_FILE))
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def get(self, node_id: str) -> Optional[Duration]:
+        """Return the duration of the test, or None if it is not known."""
+        position = self.positions.get(node_id)
+        if position is None:
+            return None
+        return Duration(
+            self.means[position], self.variances[position], self.runs[position]
+        )
+
+    def add(self, node_id: str, duration: float) -> None:
+        """Update the mean and variance of the test with a new duration."""
+        position = self.positions.get(node_id)
+        if position is None:
+            self.positions[node_id] = len(self.node_ids)
+            self.node_ids.append(node_id)
+            self.means.append(duration)
+            self.variances.append(0.0)
+            self.runs.append(1)
+            return
+        difference = duration - self.means[position]
+        self.means[position] += SMOOTHING * difference
+        self.variances[position] = (1 - SMOOTHING) * (
+            self.variances[position] + SMOOTHING * difference * difference
+        )
+        self.runs[position] += 1
+
+    def prune(self, exists: Callable[[str], bool]) -> None:
+        """Remove the tests for which exists returns False."""
+        kept = [
+            position
+            for position, node_id in enumerate(self.node_ids)
+            if exists(node_id)
+        ]
+        if len(kept) == len(self.node_ids):
+            return
+        self.node_ids = [self.node_ids[position] for position in kept]
+        self.positions = {node_id: index for index, node_id in enumerate(self.node_ids)}
+        self.means = array("d", map(self.means.__getitem__, kept))
+        self.variances = array("d", map(self.variances.__getitem__, kept))
+        self.runs = array("I", map(self.runs.__getitem__, kept))
+
+    def load(self) -> None:
+        """
+        Read the history from its file. A missing or invalid file
+        is handled like an empty history.
+        """
+        try:
+            with open(self.path, "rb") as history:
+                data = history.read()
+            magic, version, count, size = HEADER.unpack_from(data)
+            if magic != MAGIC or version != VERSION:
+                return
+            offset = HEADER.size + size
+            node_ids = data[HEADER.size : offset].decode().split("\0") if count else []
+            means = array("d")
+            means.frombytes(data[offset : offset + 8 * count])
+            offset += 8 * count
+            variances = array("d")
+            variances.frombytes(data[offset : offset + 8 * count])
+            offset += 8 * count
+            runs = array("I")
+            runs.frombytes(data[offset : offset + 4 * count])
+        except (OSError, ValueError, struct.error):
+            return
+        if not len(node_ids) == len(means) == len(variances) == len(runs) == count:
+            return
+        if sys.byteorder == "big":
+            for values in (means, variances, runs):
+                values.byteswap()
+        self.node_ids = node_ids
+        self.positions = {node_id: index for index, node_id in enumerate(node_ids)}
+        self.means = means
+        self.variances = variances
+        self.runs = runs
+
+    def save(self) -> None:
+        """Write the history to its file, replacing it atomically."""
+        node_ids = "\0".join(self.node_ids).encode()
+        temp_path = f"{self.path}.{os.getpid()}"
+        try:
+            with open(temp_path, "wb") as history:
+                history.write(
+                    HEADER.pack(MAGIC, VERSION, len(self.node_ids), len(node_ids))
+                )
+                history.write(node_ids)
+                history.write(little_endian(self.means))
+                history.write(little_endian(self.variances))
+                history.write(little_endian(self.runs))
+            os.replace(temp_path, self.path)
+        except OSError:
+            # the history is only an optimization, so it is not
+            # an error if it cannot be written
+            pass
+
+
+def little_endian(values: "array[Any]") -> bytes:
+    """Return the raw values of the array in little-endian byte order."""
+    if sys.byteorder == "big":
+        values = values[:]
+        values.byteswap()
+    return values.tobytes()
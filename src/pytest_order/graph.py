@@ -0,0 +1,741 @@
+import heapq
+from array import array
+from collections import deque
+from collections.abc import Hashable, Iterable, Mapping, Sequence
+from typing import Optional
+
+#: flag for edges that place the moved item after the anchor item
+AFTER = 1
+#: flag for edges that are created from dependency markers
+DEPENDENCY = 2
+#: the value in an ordinal array for an item without ordinal
+NO_ORDER = -(1 << 63)
+
+
+class ConstraintGraph:
+    """
+    Holds all relative constraints of a session as a graph.
+
+    Items are referenced by their collection index. Each before/after or
+    dependency mark is an edge from the anchor item to the item that is
+    placed relative to it (the moved item). The edge endpoints, flags and
+    sort keys are held in parallel arrays indexed by the edge number, and
+    the incoming edges of each item are chained via the ``next_in`` array,
+    so that the constraints of a subset of items can be collected without
+    scanning all edges.
+    Marks that describe an already known edge (the same item placed in
+    the same direction relative to the same anchor) are ignored.
+    """
+
+    def __init__(self, nr_items: int) -> None:
+        self.anchors = array("i")
+        self.targets = array("i")
+        self.flags = array("B")
+        # defines the order of the edges in a constraint view
+        self.keys = array("i")
+        # the last added incoming edge for each item, or -1
+        self.first_in = array("i", [-1]) * nr_items
+        # the previously added incoming edge of the same item, or -1
+        self.next_in = array("i")
+        # the known edges, each packed into a single integer
+        self._edges: set[int] = set()
+        self._first_key = 0
+        self._last_key = 0
+        # marks the items of the last requested subgraph
+        self._members = array("i", [0]) * nr_items
+        self._generation = 0
+
+    def __len__(self) -> int:
+        return len(self.anchors)
+
+    def add_edge(
+        self,
+        anchor: int,
+        target: int,
+        move_after: bool,
+        is_dependency: bool = False,
+        prepend: bool = False,
+    ) -> bool:
+        """
+        Add the constraint that places target before or after anchor.
+        The edges of a view are ordered by insertion, except for
+        prepended edges, which come before all other edges.
+        Return False if the edge already exists.
+        """
+        edge = (anchor << 32 | target) << 1 | move_after
+        if edge in self._edges:
+            return False
+        self._edges.add(edge)
+        if prepend:
+            self._first_key -= 1
+            self.keys.append(self._first_key)
+        else:
+            self._last_key += 1
+            self.keys.append(self._last_key)
+        self.anchors.append(anchor)
+        self.targets.append(target)
+        self.flags.append(
+            (AFTER if move_after else 0) | (DEPENDENCY if is_dependency else 0)
+        )
+        self.next_in.append(self.first_in[target])
+        self.first_in[target] = len(self.anchors) - 1
+        return True
+
+    def execution_order(self, edge: int) -> tuple[int, int]:
+        """Return the items of the edge in the order they shall be executed."""
+        if self.flags[edge] & AFTER:
+            return self.anchors[edge], self.targets[edge]
+        return self.targets[edge], self.anchors[edge]
+
+    def marker_name(self, edge: int) -> str:
+        """Return the name of the marker kind that created the edge."""
+        if self.flags[edge] & DEPENDENCY:
+            return "dependency"
+        return "after" if self.flags[edge] & AFTER else "before"
+
+    def incoming(self, item: int) -> Iterable[int]:
+        """Yield the edges that place the given item."""
+        edge = self.first_in[item]
+        while edge >= 0:
+            yield edge
+            edge = self.next_in[edge]
+
+    def subgraph(self, items: Iterable[int]) -> "ConstraintView":
+        """Return the induced subgraph for the given items."""
+        items = list(items)
+        self._generation += 1
+        generation = self._generation
+        members = self._members
+        for item in items:
+            members[item] = generation
+        anchors = self.anchors
+        edges = [
+            edge
+            for item in items
+            for edge in self.incoming(item)
+            if members[anchors[edge]] == generation
+        ]
+        return ConstraintView(self, edges)
+
+    def partition(
+        self, groups: Mapping[Hashable, list[int]]
+    ) -> tuple[dict[Hashable, "ConstraintView"], list[int]]:
+        """
+        Split the graph into the induced subgraphs of the given scope groups
+        using a single pass over all edges.
+        Return the subgraphs by group key, and the edges between items of
+        different groups, which cannot be handled inside any of the groups.
+        """
+        group_ids = array("i", [0]) * len(self._members)
+        for group_id, items in enumerate(groups.values()):
+            for item in items:
+                group_ids[item] = group_id
+        group_edges: list[list[int]] = [[] for _ in groups]
+        cross_group_edges = []
+        for edge, (anchor, target) in enumerate(zip(self.anchors, self.targets)):
+            group_id = group_ids[target]
+            if group_ids[anchor] == group_id:
+                group_edges[group_id].append(edge)
+            else:
+                cross_group_edges.append(edge)
+        cross_group_edges.sort(key=self.keys.__getitem__)
+        return (
+            {
+                key: ConstraintView(self, edges)
+                for key, edges in zip(groups, group_edges)
+            },
+            cross_group_edges,
+        )
+
+
+class ConstraintView:
+    """
+    The constraints between the items of a scope.
+    Holds the numbers of the relative and dependency edges between the
+    items, each ordered by their sort key.
+    """
+
+    def __init__(self, graph: ConstraintGraph, edges: list[int]) -> None:
+        self.graph = graph
+        edges.sort(key=graph.keys.__getitem__)
+        flags = graph.flags
+        self.rel_edges = array("i", (e for e in edges if not flags[e] & DEPENDENCY))
+        self.dep_edges = array("i", (e for e in edges if flags[e] & DEPENDENCY))
+
+    def __bool__(self) -> bool:
+        return bool(self.rel_edges or self.dep_edges)
+
+    def __len__(self) -> int:
+        return len(self.rel_edges) + len(self.dep_edges)
+
+    def edges(self) -> Iterable[int]:
+        yield from self.rel_edges
+        yield from self.dep_edges
+
+    def subgraph(self, items: Iterable[int]) -> "ConstraintView":
+        return self.graph.subgraph(items)
+
+    def is_satisfied_by(self, items: list[int]) -> bool:
+        """
+        Return True if the given order of the items already satisfies all
+        constraints, checked in a single pass over the edges.
+        """
+        position = {item: index for index, item in enumerate(items)}
+        execution_order = self.graph.execution_order
+        for edge in self.edges():
+            first, second = execution_order(edge)
+            if position[first] > position[second]:
+                return False
+        return True
+
+    def sort(
+        self,
+        items: list[int],
+        orders: Sequence[int],
+        minimal_cycle_breaking: bool = False,
+    ) -> tuple[list[int], list[int]]:
+        """
+        Order the items so that all constraints are satisfied while staying
+        as close as possible to the given baseline order.
+
+        Uses a single Kahn topological sort, where the items that are ready
+        to be placed are taken from a heap keyed by their baseline position.
+        An item that has to be placed before another item that comes first
+        in the baseline is keyed as if it had been moved directly in front
+        of it (see _placement_keys), so that it is placed there instead of
+        at its own position. An item that has to be placed after another
+        item is placed as soon as that item has been placed, if it comes
+        first in the baseline.
+        An unordered item is placed relative to an item with an ordinal
+        instead of the other way around.
+
+        If the sort stops because of a constraint cycle, the items are
+        sorted again, this time placing the item of a cycle that comes
+        first in the baseline at its position regardless of its remaining
+        constraints, and the constraints between the items of the cycle
+        are returned as unhandled. If minimal_cycle_breaking is set, the
+        items are instead sorted again without a small set of edges that
+        breaks all cycles (see feedback_edges), and only these edges are
+        returned as unhandled.
+        Returns the ordered items and the unhandled edges.
+        """
+        result, unhandled = self._sort(items, orders, set())
+        if unhandled and minimal_cycle_breaking:
+            feedback_edges = self.feedback_edges()
+            result, _ = self._sort(items, orders, feedback_edges)
+            unhandled = [edge for edge in self.edges() if edge in feedback_edges]
+        return result, unhandled
+
+    def _sort(
+        self, items: list[int], orders: Sequence[int], ignored_edges: set[int]
+    ) -> tuple[list[int], list[int]]:
+        graph = self.graph
+        successors: dict[int, list[tuple[int, int]]] = {}
+        predecessors: dict[int, list[int]] = {}
+        in_degree = dict.fromkeys(items, 0)
+        # maps the items placed in front of other items to these items
+        placed_before: dict[int, list[int]] = {}
+        for edge in self.edges():
+            anchor, target = graph.anchors[edge], graph.targets[edge]
+            if anchor == target or edge in ignored_edges:
+                continue
+            move_after = graph.flags[edge] & AFTER
+            if orders[target] != NO_ORDER and orders[anchor] == NO_ORDER:
+                anchor, target, move_after = target, anchor, not move_after
+            if move_after:
+                successors.setdefault(anchor, []).append((target, edge))
+                predecessors.setdefault(target, []).append(anchor)
+                in_degree[target] += 1
+            else:
+                successors.setdefault(target, []).append((anchor, edge))
+                predecessors.setdefault(anchor, []).append(target)
+                in_degree[anchor] += 1
+                placed_before.setdefault(target, []).append(anchor)
+
+        keys = _placement_keys(items, placed_before, predecessors)
+        result = _kahn_sort(items, keys, successors, dict(in_degree))
+        if result is not None:
+            return result, []
+        # constraint cycle - sort again without pulling the items of a cycle
+        # in front of each other, as they cannot all be placed correctly
+        cycle_of = {
+            item: root
+            for root, component in _strong_components(successors)
+            for item in component
+        }
+        predecessors = {
+            item: [
+                predecessor
+                for predecessor in item_predecessors
+                if predecessor not in cycle_of
+                or cycle_of[predecessor] != cycle_of.get(item)
+            ]
+            for item, item_predecessors in predecessors.items()
+        }
+        keys = _placement_keys(items, placed_before, predecessors)
+        result, cycle_edges = _kahn_sort_with_cycles(items, keys, successors, in_degree)
+        return result, [edge for edge in self.edges() if edge in cycle_edges]
+
+    def cycles(self) -> list[list[int]]:
+        """
+        Return a constraint cycle for each strongly connected component
+        with more than one item, given as the edges along the cycle in
+        execution order.
+        The components are found with Tarjan's algorithm, and the shortest
+        cycle through the root of each component with a breadth-first
+        search, so that the whole pass is linear in the number of edges.
+        """
+        successors = self._successors()
+        return [
+            _shortest_cycle(root, component, successors)
+            for root, component in _strong_components(successors)
+        ]
+
+    def feedback_edges(self) -> set[int]:
+        """
+        Return a small set of edges whose removal breaks all cycles.
+        The edges are chosen separately in each strongly connected component
+        using the greedy heuristic by Eades, Lin and Smyth. Dependency edges
+        are weighted higher than before/after edges, so that dependencies
+        are only dropped if a cycle consists of dependencies only.
+        """
+        successors = self._successors()
+        dependency_weight = len(self) + 1
+        weights = {
+            edge: dependency_weight if self.graph.flags[edge] & DEPENDENCY else 1
+            for edge in self.edges()
+        }
+        feedback_edges = set()
+        for _, component in _strong_components(successors):
+            feedback_edges.update(
+                _greedy_feedback_edges(component, successors, weights)
+            )
+        return feedback_edges
+
+    def _successors(self) -> dict[int, list[tuple[int, int]]]:
+        """Map each item to the items and edges that follow it in execution."""
+        successors: dict[int, list[tuple[int, int]]] = {}
+        for edge in self.edges():
+            first, second = self.graph.execution_order(edge)
+            if first != second:
+                successors.setdefault(first, []).append((second, edge))
+        return successors
+
+
+def _placement_keys(
+    items: list[int],
+    placed_before: dict[int, list[int]],
+    predecessors: dict[int, list[int]],
+) -> dict[int, int]:
+    """
+    Return the key of each item for sorting, which is its label in the
+    given order after moving each item that has to be placed in front of
+    other items directly in front of the first of them, if it comes after
+    it. The items it is placed in front of are moved first, and of several
+    items placed in front of the same item, the item of the first
+    constraint ends up nearest to it.
+    A moved item keeps its new place, so the items that have to be placed
+    before it and come after it are moved directly in front of it as well.
+    """
+    order = _LabeledList(items)
+    moved: list[int] = []
+    visited: set[int] = set()
+    on_path: set[int] = set()
+    for start in reversed(placed_before):
+        if start in visited:
+            continue
+        stack = [(start, 0)]
+        on_path.add(start)
+        while stack:
+            item, next_anchor = stack[-1]
+            anchors = placed_before.get(item, ())
+            while next_anchor < len(anchors) and (
+                anchors[next_anchor] in visited or anchors[next_anchor] in on_path
+            ):
+                next_anchor += 1
+            if next_anchor < len(anchors):
+                stack[-1] = (item, next_anchor + 1)
+                stack.append((anchors[next_anchor], 0))
+                on_path.add(anchors[next_anchor])
+                continue
+            stack.pop()
+            on_path.discard(item)
+            visited.add(item)
+            if anchors:
+                first = min(anchors, key=order.labels.__getitem__)
+                if order.is_before(first, item):
+                    order.move_before(item, first)
+                    moved.append(item)
+
+    # each item is pulled forward at most once, so that cycles terminate
+    pulled = set(moved)
+    while moved:
+        item = moved.pop()
+        for predecessor in reversed(predecessors.get(item, ())):
+            if predecessor not in pulled and order.is_before(item, predecessor):
+                order.move_before(predecessor, item)
+                pulled.add(predecessor)
+                moved.append(predecessor)
+    return order.labels
+
+
+def _kahn_sort(
+    items: list[int],
+    keys: dict[int, int],
+    successors: dict[int, list[tuple[int, int]]],
+    in_degree: dict[int, int],
+) -> Optional[list[int]]:
+    """
+    Return the items in topological order, taking the ready item with the
+    smallest key first, or None if a constraint cycle stops the sort.
+    """
+    ready = [(keys[item], item) for item in items if not in_degree[item]]
+    heapq.heapify(ready)
+    result: list[int] = []
+    while ready:
+        _, item = heapq.heappop(ready)
+        result.append(item)
+        for successor, _ in successors.get(item, ()):
+            in_degree[successor] -= 1
+            if not in_degree[successor]:
+                heapq.heappush(ready, (keys[successor], successor))
+    return result if len(result) == len(items) else None
+
+
+def _kahn_sort_with_cycles(
+    items: list[int],
+    keys: dict[int, int],
+    successors: dict[int, list[tuple[int, int]]],
+    in_degree: dict[int, int],
+) -> tuple[list[int], set[int]]:
+    """
+    Return the items in topological order as in _kahn_sort, where an item
+    that only waits for items of its own constraint cycle is placed
+    regardless if it has a smaller key than all ready items.
+    Also return the edges inside of the cycles, which cannot all be
+    satisfied.
+    """
+    # the items of the constraint cycles that are not placed yet, the
+    # cycle of each of these items, and the number of unplaced
+    # predecessors of each item outside of its own cycle
+    cycles: list[set[int]] = []
+    cycle_of: dict[int, int] = {}
+    outside_degree = dict(in_degree)
+    blocked: list[tuple[int, int]] = []
+
+    def find_cycles(cycle_items: Iterable[int]) -> None:
+        """
+        Find the cycles between the given items, and add the items that
+        only wait for items of their own cycle to the blocked items.
+        """
+        members = set(cycle_items)
+        cycle_successors = {
+            item: [
+                (successor, edge)
+                for successor, edge in successors.get(item, ())
+                if successor in members
+            ]
+            for item in members
+        }
+        for item in members:
+            cycle_of.pop(item, None)
+        for _, component in _strong_components(cycle_successors):
+            cycle_of.update(dict.fromkeys(component, len(cycles)))
+            cycles.append(component)
+        for item in members:
+            outside_degree[item] = in_degree[item]
+        for item in members:
+            for successor, _ in cycle_successors[item]:
+                if successor in cycle_of and cycle_of.get(item) == cycle_of[successor]:
+                    outside_degree[successor] -= 1
+        for item in members:
+            if item in cycle_of and in_degree[item] and not outside_degree[item]:
+                heapq.heappush(blocked, (keys[item], item))
+
+    find_cycles(successors)
+    cycle_edges = {
+        edge
+        for item, item_successors in successors.items()
+        if item in cycle_of
+        for successor, edge in item_successors
+        if cycle_of[item] == cycle_of.get(successor)
+    }
+
+    ready = [(keys[item], item) for item in items if not in_degree[item]]
+    heapq.heapify(ready)
+    result: list[int] = []
+    while len(result) < len(items):
+        broken_cycle = None
+        if blocked and (not ready or blocked[0] < ready[0]):
+            _, item = heapq.heappop(blocked)
+            if item not in cycle_of or not in_degree[item] or outside_degree[item]:
+                # the item is no longer blocked by its cycle only
+                continue
+            # constraint cycle - place the blocked item as it comes
+            # before all ready items, ignoring its remaining constraints
+            broken_cycle = cycle_of[item]
+            in_degree[item] = 0
+        else:
+            _, item = heapq.heappop(ready)
+        result.append(item)
+        for successor, _ in successors.get(item, ()):
+            if not in_degree[successor]:
+                # placed before by breaking a cycle
+                continue
+            in_degree[successor] -= 1
+            if in_degree[successor] == 0:
+                heapq.heappush(ready, (keys[successor], successor))
+            elif successor in cycle_of and cycle_of.get(item) != cycle_of[successor]:
+                outside_degree[successor] -= 1
+                if not outside_degree[successor]:
+                    heapq.heappush(blocked, (keys[successor], successor))
+        if broken_cycle is not None:
+            # the remaining items of the cycle may still form cycles
+            find_cycles(member for member in cycles[broken_cycle] if in_degree[member])
+            cycle_of.pop(item, None)
+    return result, cycle_edges
+
+
+def _strong_components(
+    successors: dict[int, list[tuple[int, int]]],
+) -> list[tuple[int, set[int]]]:
+    """
+    Return the root and the items of each strongly connected component
+    with more than one item, using an iterative version of Tarjan's algorithm.
+    """
+    index: dict[int, int] = {}
+    low_link: dict[int, int] = {}
+    stack: list[int] = []
+    on_stack: set[int] = set()
+    components = []
+    for root in successors:
+        if root in index:
+            continue
+        index[root] = low_link[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, 0)]
+        while work:
+            item, next_successor = work[-1]
+            item_successors = successors.get(item, ())
+            if next_successor < len(item_successors):
+                work[-1] = (item, next_successor + 1)
+                successor = item_successors[next_successor][0]
+                if successor not in index:
+                    index[successor] = low_link[successor] = len(index)
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    work.append((successor, 0))
+                elif successor in on_stack:
+                    low_link[item] = min(low_link[item], index[successor])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low_link[parent] = min(low_link[parent], low_link[item])
+            if low_link[item] == index[item]:
+                component = set()
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.add(member)
+                    if member == item:
+                        break
+                if len(component) > 1:
+                    components.append((item, component))
+    return components
+
+
+def _greedy_feedback_edges(
+    component: set[int],
+    successors: dict[int, list[tuple[int, int]]],
+    weights: dict[int, int],
+) -> list[int]:
+    """
+    Order the items of a strongly connected component using the greedy
+    heuristic by Eades, Lin and Smyth, and return the edges that point
+    backwards in that order.
+    Sinks are moved to the end and sources to the start of the order,
+    otherwise the item with the largest difference between the weights of
+    its outgoing and incoming edges is placed next at the start.
+    """
+    out_edges: dict[int, list[tuple[int, int]]] = {item: [] for item in component}
+    in_edges: dict[int, list[tuple[int, int]]] = {item: [] for item in component}
+    for item in component:
+        for successor, edge in successors.get(item, ()):
+            if successor in component:
+                out_edges[item].append((successor, edge))
+                in_edges[successor].append((item, edge))
+    out_count = {item: len(out_edges[item]) for item in component}
+    in_count = {item: len(in_edges[item]) for item in component}
+    delta = {
+        item: sum(weights[edge] for _, edge in out_edges[item])
+        - sum(weights[edge] for _, edge in in_edges[item])
+        for item in component
+    }
+    candidates = [(-delta[item], item) for item in component]
+    heapq.heapify(candidates)
+    sinks: list[int] = []
+    sources: list[int] = []
+    start: list[int] = []
+    end: list[int] = []
+    placed: set[int] = set()
+
+    def place(item: int) -> None:
+        placed.add(item)
+        for successor, edge in out_edges[item]:
+            if successor not in placed:
+                in_count[successor] -= 1
+                delta[successor] += weights[edge]
+                if in_count[successor] == 0:
+                    sources.append(successor)
+                else:
+                    heapq.heappush(candidates, (-delta[successor], successor))
+        for predecessor, edge in in_edges[item]:
+            if predecessor not in placed:
+                out_count[predecessor] -= 1
+                delta[predecessor] -= weights[edge]
+                if out_count[predecessor] == 0:
+                    sinks.append(predecessor)
+                else:
+                    heapq.heappush(candidates, (-delta[predecessor], predecessor))
+
+    while len(placed) < len(component):
+        if sinks:
+            item = sinks.pop()
+            if item not in placed:
+                end.append(item)
+                place(item)
+        elif sources:
+            item = sources.pop()
+            if item not in placed:
+                start.append(item)
+                place(item)
+        else:
+            negative_delta, item = heapq.heappop(candidates)
+            if item not in placed and -negative_delta == delta[item]:
+                start.append(item)
+                place(item)
+    rank = {item: index for index, item in enumerate(start + end[::-1])}
+    return [
+        edge
+        for item in component
+        for successor, edge in out_edges[item]
+        if rank[successor] < rank[item]
+    ]
+
+
+def _shortest_cycle(
+    start: int, component: set[int], successors: dict[int, list[tuple[int, int]]]
+) -> list[int]:
+    """Return the edges of the shortest cycle through start in the component."""
+    parents: dict[int, tuple[int, int]] = {}
+    queue = deque([start])
+    while queue:
+        item = queue.popleft()
+        for successor, edge in successors.get(item, ()):
+            if successor == start:
+                cycle = [edge]
+                while item != start:
+                    item, edge = parents[item]
+                    cycle.append(edge)
+                cycle.reverse()
+                return cycle
+            if successor in component and successor not in parents:
+                parents[successor] = (item, edge)
+                queue.append(successor)
+    return []
+
+
+class _LabeledList:
+    """
+    A doubly linked list of items with increasing integer labels, so that
+    the order of two items can be compared by their labels. A moved item
+    gets a label between its new neighbors. If there is no free label
+    left, only the items in the smallest enclosing label range that is
+    sparse enough are labeled again, as in the order-maintenance structure
+    by Bender et al., so that a move takes amortized logarithmic time.
+    """
+
+    __slots__ = ("labels", "next", "previous", "universe_bits")
+
+    #: the allowed density of a label range shrinks by this factor per level
+    DENSITY = 1.5
+    HEAD = -1
+    TAIL = -2
+
+    def __init__(self, items: list[int]) -> None:
+        self.next = dict(zip([self.HEAD, *items], [*items, self.TAIL]))
+        self.previous = dict(zip([*items, self.TAIL], [self.HEAD, *items]))
+        # the root range never exceeds the allowed density for this size
+        self.universe_bits = max(64, 2 * len(items).bit_length() + 2)
+        universe = 1 << self.universe_bits
+        gap = universe // (len(items) + 1)
+        self.labels = {item: (index + 1) * gap for index, item in enumerate(items)}
+        self.labels[self.HEAD] = -1
+        self.labels[self.TAIL] = universe
+
+    def items(self) -> list[int]:
+        result = []
+        item = self.next[self.HEAD]
+        while item != self.TAIL:
+            result.append(item)
+            item = self.next[item]
+        return result
+
+    def is_before(self, item: int, other: int) -> bool:
+        return self.labels[item] < self.labels[other]
+
+    def move_after(self, item: int, anchor: int) -> None:
+        self._remove(item)
+        self._insert(item, anchor, self.next[anchor])
+
+    def move_before(self, item: int, anchor: int) -> None:
+        self._remove(item)
+        self._insert(item, self.previous[anchor], anchor)
+
+    def _remove(self, item: int) -> None:
+        previous, following = self.previous[item], self.next[item]
+        self.next[previous] = following
+        self.previous[following] = previous
+
+    def _insert(self, item: int, previous: int, following: int) -> None:
+        self.next[previous] = self.previous[following] = item
+        self.previous[item], self.next[item] = previous, following
+        if self.labels[following] - self.labels[previous] < 2:
+            self._relabel(item, previous, following)
+        else:
+            self.labels[item] = (self.labels[previous] + self.labels[following]) // 2
+
+    def _relabel(self, item: int, previous: int, following: int) -> None:
+        """
+        Spread the labels of the items in the smallest aligned label range
+        around the inserted item that holds at most DENSITY ** level items,
+        where the range has the size 2 ** level.
+        """
+        labels = self.labels
+        anchor = labels[previous] if previous != self.HEAD else labels[following]
+        first = last = item
+        count = 1
+        for level in range(1, self.universe_bits + 1):
+            start = anchor >> level << level
+            end = start + (1 << level)
+            while (
+                self.previous[first] != self.HEAD
+                and labels[self.previous[first]] >= start
+            ):
+                first = self.previous[first]
+                count += 1
+            while self.next[last] != self.TAIL and labels[self.next[last]] < end:
+                last = self.next[last]
+                count += 1
+            if count <= self.DENSITY**level:
+                break
+        gap = (end - start) // count
+        label = start + gap // 2
+        while True:
+            labels[first] = label
+            if first == last:
+                break
+            label += gap
+            first = self.next[first]
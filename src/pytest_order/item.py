@@ -1,39 +1,101 @@
 import sys
-from typing import Optional, Generic, TypeVar
-from collections import defaultdict
+from array import array
+from collections import deque
+from collections.abc import Hashable, Sequence
+from functools import lru_cache
+from typing import NamedTuple, Optional
 
-from pytest import Function, UsageError
+from pytest import Function
 
+from .graph import NO_ORDER, ConstraintView
 from .settings import Scope, Settings
 
+_MAX_ORDER = (1 << 63) - 1
 
-_ItemType = TypeVar("_ItemType", "Item", "ItemGroup")
+
+class NodeId(NamedTuple):
+    """The components of a test node id."""
+
+    directories: tuple[str, ...]
+    module: str
+    classes: tuple[str, ...]
+    function: str
+    parameters: str
+
+    @property
+    def path(self) -> tuple[str, ...]:
+        """The path components including the module."""
+        return self.directories + (self.module,)
+
+    @property
+    def names(self) -> tuple[str, ...]:
+        """The path and name components without the parameters."""
+        return self.directories + (self.module,) + self.classes + (self.function,)
+
+
+@lru_cache(maxsize=4096)
+def _directory_parts(directory: str) -> tuple[str, ...]:
+    if not directory:
+        return ()
+    return tuple(sys.intern(part) for part in directory.split("/"))
+
+
+def parse_node_id(node_id: str) -> NodeId:
+    """
+    Split the node id of a test into its components.
+    The component names are interned, as they are shared by many tests.
+    """
+    path, _, names = node_id.partition("::")
+    directory, _, module = path.rpartition("/")
+    # class and function names cannot contain brackets, so the first
+    # bracket starts the parameter id of a parametrized test
+    names, bracket, parameters = names.partition("[")
+    if bracket:
+        parameters = parameters[:-1]
+    *classes, function = names.split("::")
+    return NodeId(
+        _directory_parts(directory),
+        sys.intern(module),
+        tuple(sys.intern(name) for name in classes),
+        sys.intern(function),
+        parameters,
+    )
 
 
 class Item:
     """Represents a single test item."""
 
+    __slots__ = ("_node_id", "_parts", "collection_index", "item", "order")
+
     def __init__(self, item: Function, collection_index: int = 0) -> None:
         self.item: Function = item
-        self.nr_rel_items: int = 0
         self.order: Optional[int] = None
         self._node_id: Optional[str] = None
+        self._parts: Optional[NodeId] = None
         self.collection_index: int = collection_index
 
-    def inc_rel_marks(self) -> None:
-        if self.order is None:
-            self.nr_rel_items += 1
-
-    def dec_rel_marks(self) -> None:
-        if self.order is None:
-            self.nr_rel_items -= 1
+    @property
+    def parts(self) -> NodeId:
+        """The parsed node id."""
+        if self._parts is None:
+            self._parts = parse_node_id(self.node_id)
+        return self._parts
 
     @property
     def module_path(self) -> str:
-        return self.item.nodeid[: self.node_id.index("::")]
+        return "/".join(self.parts.path)
 
-    def parent_path(self, level) -> str:
-        return "/".join(self.module_path.split("/")[:level])
+    def scoped_node_id(self, scope: Scope) -> str:
+        """
+        Return the part of the node id that defines the given scope
+        (the module path or the class path, or an empty string for
+        session scope).
+        """
+        if scope == Scope.MODULE:
+            return self.module_path
+        if scope == Scope.CLASS:
+            return "::".join((self.module_path,) + self.parts.classes)
+        return ""
 
     @property
     def node_id(self) -> str:
@@ -43,67 +105,143 @@ class Item:
         return self._node_id
 
 
+def order_value(order: Optional[int]) -> int:
+    """Return the value of the given ordinal in an ordinal array."""
+    if order is None:
+        return NO_ORDER
+    return min(max(order, NO_ORDER + 1), _MAX_ORDER)
+
+
+# the rank of items without ordinal, between the ranks of the items
+# with non-negative and with negative ordinals
+UNORDERED_RANK = 1 << 63
+
+
+def ordinal_rank(order: int) -> int:
+    """
+    Return the rank of the given value of an ordinal array, so that sorting
+    by rank places the items with non-negative ordinals first, then the
+    items without ordinal, and then the items with negative ordinals.
+    """
+    if order == NO_ORDER:
+        return UNORDERED_RANK
+    if order >= 0:
+        return order
+    return (1 << 64) + order
+
+
+class ItemIndex:
+    """
+    Holds the properties of all items needed for sorting in parallel
+    arrays indexed by the collection index, so that the items can be
+    sorted as permutations of their indexes without accessing the
+    test items themselves.
+    The ordinal of each item is saved in orders (NO_ORDER for items
+    without ordinal), and module_keys and class_keys hold a number
+    for the module and the class group of each item.
+    """
+
+    def __init__(
+        self, orders: "array[int]", module_keys: "array[int]", class_keys: "array[int]"
+    ) -> None:
+        self.orders = orders
+        self.module_keys = module_keys
+        self.class_keys = class_keys
+
+    @classmethod
+    def from_items(cls, items: Sequence[Item]) -> "ItemIndex":
+        module_keys: dict[Hashable, int] = {}
+        class_keys: dict[Hashable, int] = {}
+        orders = array("q", [NO_ORDER]) * len(items)
+        module_key_array = array("i", [0]) * len(items)
+        class_key_array = array("i", [0]) * len(items)
+        for index, item in enumerate(items):
+            parts = item.parts
+            orders[index] = order_value(item.order)
+            module_key_array[index] = module_keys.setdefault(
+                parts[:2], len(module_keys)
+            )
+            class_key_array[index] = class_keys.setdefault(
+                (parts.directories, parts.module, parts.classes[:1]), len(class_keys)
+            )
+        return cls(orders, module_key_array, class_key_array)
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+
 class ItemList:
     """Handles a group of items with the same scope."""
 
     def __init__(
         self,
-        items: list[Item],
+        items: list[int],
         settings: Settings,
         scope: Scope,
-        rel_marks: list["RelativeMark[Item]"],
-        dep_marks: list["RelativeMark[Item]"],
+        constraints: ConstraintView,
+        orders: Sequence[int],
     ) -> None:
         self.items = items
         self.settings = settings
         self.scope = scope
-        self.start_items: list[tuple[int, list[Item]]] = []
-        self.end_items: list[tuple[int, list[Item]]] = []
-        self.unordered_items: list[Item] = []
-        self._start_items: dict[int, list[Item]] = {}
-        self._end_items: dict[int, list[Item]] = {}
-        self.all_rel_marks = rel_marks
-        self.all_dep_marks = dep_marks
-        self.rel_marks = filter_marks(rel_marks, items)
-        self.dep_marks = filter_marks(dep_marks, items)
-
-    def collect_markers(self, item: Item) -> None:
+        self.orders = orders
+        self.start_items: list[tuple[int, list[int]]] = []
+        self.end_items: list[tuple[int, list[int]]] = []
+        self.unordered_items: list[int] = []
+        self._start_items: dict[int, list[int]] = {}
+        self._end_items: dict[int, list[int]] = {}
+        self.constraints = constraints.subgraph(items)
+        # the edges that could not be handled due to a constraint cycle
+        self.unhandled_edges: list[int] = []
+
+    def collect_markers(self, item: int) -> None:
         self.handle_order_mark(item)
-        if item.nr_rel_items or item.order is None:
+        if self.orders[item] == NO_ORDER:
             self.unordered_items.append(item)
 
-    def handle_order_mark(self, item: Item) -> None:
-        if item.order is not None:
-            if item.order < 0:
-                self._end_items.setdefault(item.order, []).append(item)
+    def handle_order_mark(self, item: int) -> None:
+        order = self.orders[item]
+        if order != NO_ORDER:
+            if order < 0:
+                self._end_items.setdefault(order, []).append(item)
             else:
-                self._start_items.setdefault(item.order, []).append(item)
+                self._start_items.setdefault(order, []).append(item)
 
-    def sort_numbered_items(self) -> list[Item]:
+    def sort_numbered_items(self) -> list[int]:
+        """
+        Return the items sorted by their ordinals, with the unordered items
+        between the items with non-negative and negative ordinals.
+        With sparse ordering, the gaps between the ordinals are filled with
+        unordered items taken from both ends of the unordered items, so that
+        each item is placed only once.
+        """
         self.start_items = sorted(self._start_items.items())
         self.end_items = sorted(self._end_items.items())
+        unordered_items = deque(self.unordered_items)
         sorted_list = []
         index = 0
         for order, items in self.start_items:
             if self.settings.sparse_ordering:
-                while order > index and self.unordered_items:
-                    sorted_list.append(self.unordered_items.pop(0))
+                while order > index and unordered_items:
+                    sorted_list.append(unordered_items.popleft())
                     index += 1
             sorted_list += items
             index += len(items)
-        mid_index = len(sorted_list)
+        # the items at the end are collected in reverse order
+        reversed_end_list: list[int] = []
         index = -1
         for order, items in reversed(self.end_items):
             if self.settings.sparse_ordering:
-                while order < index and self.unordered_items:
-                    sorted_list.insert(mid_index, self.unordered_items.pop())
+                while order < index and unordered_items:
+                    reversed_end_list.append(unordered_items.pop())
                     index -= 1
-            sorted_list[mid_index:mid_index] = items
+            reversed_end_list += reversed(items)
             index -= len(items)
-        sorted_list[mid_index:mid_index] = self.unordered_items
+        sorted_list += unordered_items
+        sorted_list += reversed(reversed_end_list)
         return sorted_list
 
-    def apply_relative_constraints(self, sorted_list: list[Item]) -> bool:
+    def apply_relative_constraints(self, sorted_list: list[int]) -> bool:
         """
         Reorder sorted_list to satisfy all relative (before/after and
         dependency) constraints.
@@ -112,82 +250,36 @@ class ItemList:
         which act only as a baseline preference: relative markers always take
         preference, so an ordinal position is relaxed whenever it conflicts with
         a relative constraint (see "Combination of absolute and relative
-        ordering" in the docs).
-
-        Two phases:
-        1. Iterative move_item passes satisfy the constraints that can be met by
-           moving a single item, preserving the position of items not involved
-           in any constraint and the established tie-breaking.
-        2. A stable topological sort over the full constraint set re-validates
-           the result. It leaves an already-valid baseline unchanged, but
-           resolves constraints the iterative pass cannot keep on its own
-           (transitive chains, or a marker relative to an ordinal-pinned anchor
-           that a later move re-breaks).
+        ordering" in the docs). The constraints are applied in a single
+        topological sort that keeps the items as close to the baseline
+        as possible (see ConstraintView.sort).
 
         Only a genuine constraint cycle cannot be satisfied; in that case the
         caller reports the offending markers.
 
         Returns True if all constraints were satisfied (no cycle).
         """
-        if not self.rel_marks and not self.dep_marks:
+        if not self.constraints:
             return True
+        sorted_list[:], self.unhandled_edges = self.constraints.sort(
+            sorted_list, self.orders, self.settings.minimal_cycle_breaking
+        )
+        return not self.unhandled_edges
 
-        rel_marks = list(self.rel_marks)
-        dep_marks = list(self.dep_marks)
-        self._apply_iterative(sorted_list)
-
-        ordered, had_cycle = self._sort_by_topology(sorted_list, rel_marks, dep_marks)
-        sorted_list[:] = ordered
-        return not had_cycle
-
-    def _apply_iterative(self, sorted_list: list[Item]) -> None:
-        still_left = 0
-        length = self.number_of_rel_groups()
-        while length and still_left != length:
-            still_left = length
-            self.handle_rel_marks(sorted_list)
-            self.handle_dep_marks(sorted_list)
-            length = self.number_of_rel_groups()
-
-    def number_of_rel_groups(self) -> int:
-        return len(self.rel_marks) + len(self.dep_marks)
-
-    def handle_rel_marks(self, sorted_list: list[Item]) -> None:
-        self.handle_relative_marks(self.rel_marks, sorted_list, self.all_rel_marks)
-
-    def handle_dep_marks(self, sorted_list: list[Item]) -> None:
-        self.handle_relative_marks(self.dep_marks, sorted_list, self.all_dep_marks)
-
-    @staticmethod
-    def handle_relative_marks(
-        marks: list["RelativeMark[Item]"],
-        sorted_list: list[Item],
-        all_marks: list["RelativeMark[Item]"],
-    ) -> None:
-        for mark in reversed(marks):
-            if move_item(mark, sorted_list):
-                marks.remove(mark)
-                all_marks.remove(mark)
-
-    def print_unhandled_items(self) -> None:
-        failed_items = [mark.item for mark in self.rel_marks] + [
-            mark.item for mark in self.dep_marks
-        ]
-        msg = " ".join([item.node_id for item in failed_items])
-        sys.stdout.write("\nWARNING: cannot execute test relative to others: ")
-        sys.stdout.write(msg)
-        if self.settings.fail_all_on_failed_ordering:
-            raise UsageError(
-                f"pytest-order: cannot execute test relative to others: {msg}"
-            )
-        if self.settings.error_on_failed_ordering:
-            sys.stdout.write(" - ignoring the marker.\n")
-        else:
-            sys.stdout.write(".\n")
-        sys.stdout.flush()
-        if self.settings.error_on_failed_ordering:
-            for item in failed_items:
-                item.item.fixturenames.insert(0, "fail_after_cannot_order")
+    def unhandled_items(self) -> list[int]:
+        """
+        Return the items of the marks that could not be applied: the marked
+        items of the dropped marks if cycles are broken minimally, otherwise
+        the anchor items of all marks in the cycles.
+        """
+        graph = self.constraints.graph
+        if self.settings.minimal_cycle_breaking:
+            return [graph.targets[edge] for edge in self.unhandled_edges]
+        return [graph.anchors[edge] for edge in self.unhandled_edges]
+
+    def cycles(self) -> list[list[int]]:
+        """Return the constraint cycles as lists of edges."""
+        return self.constraints.cycles()
 
     def group_order(self) -> Optional[int]:
         if self.start_items:
@@ -196,63 +288,6 @@ class ItemList:
             return self.end_items[-1][0]
         return None
 
-    def _sort_by_topology(
-        self,
-        items: list["Item"],
-        rel_marks: list["RelativeMark[Item]"],
-        dep_marks: list["RelativeMark[Item]"],
-    ) -> tuple[list["Item"], bool]:
-        """
-        Order items so that all relative constraints are satisfied while staying as
-        close as possible to the incoming order (the absolute-ordinal baseline).
-
-        Relative constraints take preference over the baseline: each item is emitted
-        right after the items it must follow, so a conflicting ordinal position is
-        relaxed; items that no constraint orders keep their baseline order. The
-        incoming order already encodes the absolute ordinals, so no extra ordinal
-        edges are needed.
-
-        Returns (ordered_items, had_cycle). On a constraint cycle the offending edge
-        is dropped, all items are still emitted, and had_cycle is True.
-        """
-        item_set = set(items)
-        position = {item: i for i, item in enumerate(items)}
-        predecessors = _build_predecessors(rel_marks + dep_marks, item_set)
-        for item in items:
-            predecessors[item].sort(key=lambda p: position[p])
-
-        result: list[Item] = []
-        placed: set[Item] = set()
-        on_path: set[Item] = set()
-        had_cycle = False
-
-        # Iterative post-order DFS: emit unplaced predecessors before each item.
-        for start in items:
-            if start in placed:
-                continue
-            stack: list[tuple[Item, int]] = [(start, 0)]
-            on_path.add(start)
-            while stack:
-                item, next_pred = stack[-1]
-                preds = predecessors[item]
-                while next_pred < len(preds) and preds[next_pred] in placed:
-                    next_pred += 1
-                if next_pred < len(preds):
-                    pred = preds[next_pred]
-                    stack[-1] = (item, next_pred + 1)
-                    if pred in on_path:
-                        had_cycle = True
-                    else:
-                        stack.append((pred, 0))
-                        on_path.add(pred)
-                    continue
-                stack.pop()
-                on_path.discard(item)
-                placed.add(item)
-                result.append(item)
-
-        return result, had_cycle
-
 
 class ItemGroup:
     """
@@ -260,98 +295,15 @@ class ItemGroup:
     Used for sorting groups similar to Item for sorting items.
     """
 
+    __slots__ = ("items", "order")
+
     def __init__(
-        self, items: Optional[list[Item]] = None, order: Optional[int] = None
+        self, items: Optional[list[int]] = None, order: Optional[int] = None
     ) -> None:
-        self.items: list[Item] = items or []
+        self.items: list[int] = items or []
         self.order = order
-        self.nr_rel_items = 0
-
-    def inc_rel_marks(self) -> None:
-        if self.order is None:
-            self.nr_rel_items += 1
-
-    def dec_rel_marks(self) -> None:
-        if self.order is None:
-            self.nr_rel_items -= 1
 
     def extend(self, groups: list["ItemGroup"], order: Optional[int]) -> None:
         for group in groups:
             self.items.extend(group.items)
         self.order = order
-
-
-class RelativeMark(Generic[_ItemType]):
-    """
-    Represents a marker for an item or an item group.
-    Holds two related items or groups and their relationship.
-    """
-
-    def __init__(
-        self,
-        item: _ItemType,
-        item_to_move: _ItemType,
-        move_after: bool,
-    ) -> None:
-        self.item: _ItemType = item
-        self.item_to_move: _ItemType = item_to_move
-        self.move_after: bool = move_after
-
-
-def filter_marks(
-    marks: list[RelativeMark[_ItemType]], all_items: list[Item]
-) -> list[RelativeMark[_ItemType]]:
-    result = []
-    for mark in marks:
-        if mark.item in all_items and mark.item_to_move in all_items:
-            result.append(mark)
-        else:
-            mark.item_to_move.dec_rel_marks()
-    return result
-
-
-def move_item(mark: RelativeMark[_ItemType], sorted_items: list[_ItemType]) -> bool:
-    if (
-        mark.item not in sorted_items
-        or mark.item_to_move not in sorted_items
-        or mark.item.nr_rel_items
-    ):
-        return False
-    pos_item = sorted_items.index(mark.item)
-    pos_item_to_move = sorted_items.index(mark.item_to_move)
-    if mark.item_to_move.order is not None and mark.item.order is None:
-        # if the item to be moved has already been ordered numerically,
-        # and the other item is not ordered, we move that one instead
-        mark.move_after = not mark.move_after
-        mark.item, mark.item_to_move = mark.item_to_move, mark.item
-        pos_item, pos_item_to_move = pos_item_to_move, pos_item
-    mark.item_to_move.dec_rel_marks()
-    if mark.move_after:
-        if pos_item_to_move < pos_item + 1:
-            del sorted_items[pos_item_to_move]
-            sorted_items.insert(pos_item, mark.item_to_move)
-    else:
-        if pos_item_to_move > pos_item:
-            del sorted_items[pos_item_to_move]
-            pos_item -= 1
-            sorted_items.insert(pos_item + 1, mark.item_to_move)
-    return True
-
-
-def _build_predecessors(
-    marks: list["RelativeMark[Item]"],
-    item_set: set["Item"],
-) -> "defaultdict[Item, list[Item]]":
-    """Map each item to the items that must run before it, derived from the
-    relative marks. A mark either places item_to_move after item (move_after)
-    or before it."""
-    predecessors: defaultdict[Item, list[Item]] = defaultdict(list)
-    for mark in marks:
-        before, after = (
-            (mark.item, mark.item_to_move)
-            if mark.move_after
-            else (mark.item_to_move, mark.item)
-        )
-        if before in item_set and after in item_set and before is not after:
-            predecessors[after].append(before)
-    return predecessors
@@ -0,0 +1,122 @@
+from collections.abc import Iterable
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from .item import Item
+
+
+def label_components(label: str) -> tuple[str, ...]:
+    """Split a (partial) node id into its path and name components."""
+    path, _, names = label.partition("::")
+    components = tuple(path.split("/"))
+    if names:
+        components += tuple(names.split("::"))
+    return components
+
+
+class _TrieNode:
+    __slots__ = ("children", "items")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _TrieNode] = {}
+        self.items: list[Item] = []
+
+
+class _ReversedTrie:
+    """
+    Trie over the reversed components of node ids.
+    Walking the components of a label from the last to the first one
+    leads to the node that stands for all node ids ending with the label.
+    Walking further up with the reversed components of a prefix leads
+    to the items with exactly that prefix in front of the label.
+    """
+
+    def __init__(self) -> None:
+        self.root = _TrieNode()
+
+    def insert(self, components: tuple[str, ...], item: "Item") -> None:
+        node = self.root
+        for component in reversed(components):
+            node = node.children.setdefault(component, _TrieNode())
+        node.items.append(item)
+
+    @staticmethod
+    def walk(node: _TrieNode, components: Iterable[str]) -> Optional[_TrieNode]:
+        for component in components:
+            child = node.children.get(component)
+            if child is None:
+                return None
+            node = child
+        return node
+
+
+class LabelIndex:
+    """
+    Resolves the labels used in relative markers to test items.
+
+    A label is a trailing part of the node id of a test, or of the
+    class path for labels that reference a whole class. It is resolved
+    relative to the marked test: the part of the node id in front of the
+    label has to be a prefix of the node id of the marked test.
+    Parametrized tests are referenced without their parameter ids,
+    so that a label matches all parametrized variants.
+    Labels are matched by whole node id components, so that a label like
+    ``b.py::test_x`` does not match ``test_b.py::test_x``.
+    Results are cached by label and scope, so that class marks shared by
+    all methods of a class are only resolved once.
+    """
+
+    def __init__(self, items: Iterable["Item"]) -> None:
+        self.tests = _ReversedTrie()
+        self.classes = _ReversedTrie()
+        self._cache: dict[tuple[str, bool, bool, tuple[str, ...], int], list[Item]] = {}
+        for item in items:
+            components = item.parts.names
+            self.tests.insert(components, item)
+            if len(item.parts.classes) == 1:
+                self.classes.insert(components[:-1], item)
+
+    def items_for_label(
+        self, label: str, item: "Item", is_cls_mark: bool
+    ) -> list["Item"]:
+        """
+        Return the items matching the label relative to the given item.
+        If is_cls_mark is set, the label does not match test methods by
+        their name relative to the class of the marked item.
+        """
+        return self._resolve(self.tests, label, item, is_cls_mark, False)
+
+    def items_for_class_label(self, label: str, item: "Item") -> list["Item"]:
+        """Return the items of the test classes matching the label."""
+        return self._resolve(self.classes, label, item, False, True)
+
+    def _resolve(
+        self,
+        trie: _ReversedTrie,
+        label: str,
+        item: "Item",
+        is_cls_mark: bool,
+        is_cls_label: bool,
+    ) -> list["Item"]:
+        scope = item.parts.names[:-1]
+        path_length = len(item.parts.directories) + 1
+        key = (label, is_cls_mark, is_cls_label, scope, path_length)
+        items = self._cache.get(key)
+        if items is not None:
+            return items
+        items = []
+        label_node = trie.walk(trie.root, reversed(label_components(label)))
+        if label_node is not None:
+            nr_matches = 0
+            for length in range(len(scope) + 1):
+                # a class mark does not refer to methods of its own class
+                if is_cls_mark and length == path_length + 1:
+                    continue
+                node = trie.walk(label_node, reversed(scope[:length]))
+                if node is not None and node.items:
+                    items.extend(node.items)
+                    nr_matches += 1
+            if nr_matches > 1:
+                items.sort(key=lambda matching: matching.collection_index)
+        self._cache[key] = items
+        return items
@@ -0,0 +1,109 @@
+import sys
+from array import array
+from collections.abc import Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from .graph import AFTER, DEPENDENCY, ConstraintGraph, ConstraintView
+from .item import ItemIndex
+from .settings import Settings
+from .sorter import ScopeResult, ScopeSorter
+
+
+class ScopeTask:
+    """
+    Holds a scope group in a form that can be sorted in another process.
+    The items are referenced by their position in the group instead of
+    their collection index, and only the ordinals, scope keys and
+    constraint edges of the group items are kept, so that no test items
+    are needed for sorting.
+    """
+
+    __slots__ = ("graph", "index", "settings")
+
+    def __init__(
+        self,
+        settings: Settings,
+        items: list[int],
+        constraints: ConstraintView,
+        index: ItemIndex,
+    ) -> None:
+        self.settings = settings
+        self.index = ItemIndex(
+            array("q", (index.orders[item] for item in items)),
+            array("i", (index.module_keys[item] for item in items)),
+            array("i", (index.class_keys[item] for item in items)),
+        )
+        positions = {item: position for position, item in enumerate(items)}
+        graph = constraints.graph
+        # the edges are added in the order of their sort keys,
+        # so that the constraints are applied in the same order
+        self.graph = ConstraintGraph(len(items))
+        for edge in sorted(constraints.edges(), key=graph.keys.__getitem__):
+            self.graph.add_edge(
+                positions[graph.anchors[edge]],
+                positions[graph.targets[edge]],
+                move_after=bool(graph.flags[edge] & AFTER),
+                is_dependency=bool(graph.flags[edge] & DEPENDENCY),
+            )
+
+    def sort(self) -> ScopeResult:
+        """Sort the group and return the result with local indexes."""
+        items = list(range(len(self.index)))
+        sorter = ScopeSorter(
+            self.settings, items, self.graph.subgraph(items), self.index
+        )
+        return sorter.sort_items(), sorter.strategy, sorter.unhandled
+
+
+def sort_task(task: ScopeTask) -> ScopeResult:
+    return task.sort()
+
+
+def executor(workers: int) -> Executor:
+    """
+    Return a pool with the given number of workers. Threads are only used
+    if the interpreter runs without the global interpreter lock.
+    """
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)
+    if is_gil_enabled():
+        return ProcessPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def sort_in_parallel(
+    settings: Settings,
+    groups: Sequence[tuple[list[int], ConstraintView]],
+    index: ItemIndex,
+    workers: int,
+) -> list[ScopeResult]:
+    """
+    Sort the given scope groups using a pool of workers and return the
+    results in the order of the groups, mapped back to the collection
+    indexes of the items and the edges of the session constraint graph.
+    """
+    tasks = [
+        ScopeTask(settings, items, constraints, index) for items, constraints in groups
+    ]
+    # pass several groups at once to reduce the overhead for small groups
+    chunk_size = max(1, len(tasks) // (workers * 4))
+    with executor(workers) as pool:
+        local_results = list(pool.map(sort_task, tasks, chunksize=chunk_size))
+    results = []
+    for (items, constraints), (sorted_items, strategy, unhandled) in zip(
+        groups, local_results
+    ):
+        edges = sorted(constraints.edges(), key=constraints.graph.keys.__getitem__)
+        results.append(
+            (
+                [items[item] for item in sorted_items],
+                strategy,
+                [
+                    (
+                        [items[item] for item in unhandled_items],
+                        [[edges[edge] for edge in cycle] for cycle in cycles],
+                    )
+                    for unhandled_items, cycles in unhandled
+                ],
+            )
+        )
+    return results
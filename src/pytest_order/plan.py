@@ -0,0 +1,431 @@
+import hashlib
+import json
+import os
+import sys
+import time
+from array import array
+from collections.abc import Iterable
+from typing import NamedTuple, Optional
+from warnings import warn
+
+from _pytest.config import Config
+from pytest import Function, UsageError
+
+CACHE_KEY = "pytest-order/plan"
+GROUPS_CACHE_KEY = "pytest-order/groups"
+PLAN_HEADER = "# pytest-order plan"
+# the prefix of the lines after the node ids in the order plan
+PLAN_TRAILER = "# "
+SHARED_PLAN_NAME = "shared.plan"
+SHARED_PLAN_LOCK = "shared.lock"
+# the time in seconds to wait for the shared plan of the sorting xdist
+# worker before sorting the items locally; as the sorting worker has
+# already collected the items, this only has to cover the sorting itself
+SHARED_PLAN_TIMEOUT = 10.0
+
+# the options that define the settings used for sorting
+SORT_OPTIONS = (
+    "order_scope",
+    "order_scope_level",
+    "order_group_scope",
+    "sparse_ordering",
+    "order_dependencies",
+    "order_marker_prefix",
+    "error_on_failed_ordering",
+    "fail_all_on_failed_ordering",
+    "minimal_cycle_breaking",
+    "order_by_duration",
+)
+
+
+def settings_signature(config: Config) -> str:
+    """Return the values of all options that change the sort order."""
+    values = [config.getoption(option) for option in SORT_OPTIONS]
+    try:
+        values.append(config.getini("automark_dependency"))
+    except ValueError:
+        values.append(None)
+    return repr(values)
+
+
+def settings_hash(config: Config) -> str:
+    return hashlib.sha256(settings_signature(config).encode()).hexdigest()[:16]
+
+
+def marker_signature(item: Function, marker_prefix: Optional[str]) -> str:
+    """
+    Return the ordering markers of the item, including the markers of its
+    parents, and whether they are set on the item itself.
+    """
+    return repr(
+        [
+            (node is item, mark.name, mark.args, mark.kwargs)
+            for node, mark in item.iter_markers_with_node()
+            if mark.name in ("order", "dependency")
+            or (marker_prefix and mark.name.startswith(marker_prefix))
+        ]
+    )
+
+
+def collection_hash(config: Config, items: list[Function]) -> str:
+    """
+    Return a hash over the settings and the node ids and ordering
+    markers of the collected items, which defines the sort order.
+    """
+    marker_prefix = config.getoption("order_marker_prefix")
+    digest = hashlib.sha256(settings_signature(config).encode())
+    for item in items:
+        digest.update(b"\0")
+        digest.update(item.nodeid.encode())
+        digest.update(marker_signature(item, marker_prefix).encode())
+    return digest.hexdigest()
+
+
+def is_permutation(value: object, nr_items: int) -> bool:
+    """Return True if the value is a permutation of the indexes of nr_items."""
+    return (
+        isinstance(value, list)
+        and all(isinstance(index, int) for index in value)
+        and sorted(value) == list(range(nr_items))
+    )
+
+
+class PlanCache:
+    """
+    Saves the sort order of the items in the pytest cache as a permutation
+    of the collection indexes, together with the collection hash.
+    The order is reused as long as the hash does not change.
+    """
+
+    def __init__(self, config: Config, items: list[Function]) -> None:
+        assert config.cache is not None
+        self.cache = config.cache
+        self.nr_items = len(items)
+        self.hash = collection_hash(config, items)
+
+    def load(self) -> Optional[list[int]]:
+        """Return the cached permutation, or None if the items have changed."""
+        plan = self.cache.get(CACHE_KEY, None)
+        if not isinstance(plan, dict) or plan.get("hash") != self.hash:
+            return None
+        permutation = plan.get("order")
+        if not is_permutation(permutation, self.nr_items):
+            return None
+        return permutation
+
+    def save(self, permutation: list[int]) -> None:
+        self.cache.set(CACHE_KEY, {"hash": self.hash, "order": permutation})
+
+
+class GroupCache:
+    """
+    Saves the sort order of each sorted scope group in the pytest cache,
+    keyed by a hash over the node ids, ordinals and constraints of the
+    group items, so that only changed groups have to be sorted again.
+    The cached groups are only valid for the same settings, and only the
+    groups of the current session are saved again.
+    """
+
+    def __init__(self, config: Config) -> None:
+        assert config.cache is not None
+        self.cache = config.cache
+        self.settings = settings_signature(config)
+        cached = self.cache.get(GROUPS_CACHE_KEY, None)
+        self.cached_groups: dict[str, list[int]] = {}
+        if isinstance(cached, dict) and cached.get("settings") == self.settings:
+            self.cached_groups = cached.get("groups") or {}
+        self.groups: dict[str, list[int]] = {}
+
+    def get(self, group_hash: str, nr_items: int) -> Optional[list[int]]:
+        """
+        Return the cached permutation of the group items,
+        or None if the group has changed.
+        """
+        permutation = self.cached_groups.get(group_hash)
+        if permutation is None or not is_permutation(permutation, nr_items):
+            return None
+        self.groups[group_hash] = permutation
+        return permutation
+
+    def add(self, group_hash: str, permutation: list[int]) -> None:
+        self.groups[group_hash] = permutation
+
+    def save(self) -> None:
+        self.cache.set(
+            GROUPS_CACHE_KEY, {"settings": self.settings, "groups": self.groups}
+        )
+
+
+def group_hash(
+    node_ids: Iterable[str],
+    orders: Iterable[int],
+    edges: Iterable[tuple[int, int, int, bool]],
+) -> str:
+    """
+    Return a hash over the node ids and ordinals of the items in a scope
+    group and the constraint edges between them, given by the positions
+    of their items in the group, their flags and whether they are prepended.
+    """
+    digest = hashlib.sha256()
+    for node_id, order in zip(node_ids, orders):
+        digest.update(f"{node_id}\0{order}\0".encode())
+    for edge in edges:
+        digest.update(repr(edge).encode())
+    return digest.hexdigest()
+
+
+class PlanMessages(NamedTuple):
+    """
+    The warnings shown while sorting the items of an order plan,
+    and the node ids of the tests that fail because they could not
+    be ordered.
+    """
+
+    output: list[str]
+    warnings: list[str]
+    failed: list[str]
+
+
+def export_plan(
+    path: str,
+    config: Config,
+    node_ids: list[str],
+    predecessors: list[list[int]],
+    messages: Optional[PlanMessages] = None,
+) -> None:
+    """
+    Write an order plan to the given path. The first line holds the hash of
+    the ordering options, followed by the node ids in execution order, one
+    per line. The node id is followed by a tab and the comma-separated line
+    numbers (starting with 0 after the first line) of the tests that have
+    to be executed before it, if there are any.
+    The plan ends with the messages of the sorting, one per line, starting
+    with "# output", "# warning" or "# failed".
+    """
+    try:
+        with open(path, "w", encoding="utf-8") as plan:
+            plan.write(f"{PLAN_HEADER} {settings_hash(config)}\n")
+            for node_id, before in zip(node_ids, predecessors):
+                if before:
+                    plan.write(f"{node_id}\t{','.join(map(str, before))}\n")
+                else:
+                    plan.write(f"{node_id}\n")
+            if messages is not None:
+                for text in messages.output:
+                    plan.write(f"{PLAN_TRAILER}output {json.dumps(text)}\n")
+                for message in messages.warnings:
+                    plan.write(f"{PLAN_TRAILER}warning {json.dumps(message)}\n")
+                for node_id in messages.failed:
+                    plan.write(f"{PLAN_TRAILER}failed {node_id}\n")
+    except OSError as e:
+        raise UsageError(f"pytest-order: cannot write order plan: {e}")
+
+
+def read_plan(path: str) -> tuple[str, dict[str, int], PlanMessages]:
+    """
+    Read the order plan at the given path line by line.
+    Return the settings hash, the position of each node id,
+    and the messages of the sorting.
+    """
+    positions: dict[str, int] = {}
+    messages = PlanMessages([], [], [])
+    try:
+        with open(path, encoding="utf-8") as plan:
+            header, _, hash_value = plan.readline().rstrip("\n").rpartition(" ")
+            if header != PLAN_HEADER:
+                raise UsageError(f"pytest-order: '{path}' is not an order plan")
+            for line in plan:
+                line = line.rstrip("\n")
+                if not line.startswith(PLAN_TRAILER):
+                    positions[line.partition("\t")[0]] = len(positions)
+                    continue
+                kind, _, value = line[len(PLAN_TRAILER) :].partition(" ")
+                if kind == "output":
+                    messages.output.append(json.loads(value))
+                elif kind == "warning":
+                    messages.warnings.append(json.loads(value))
+                elif kind == "failed":
+                    messages.failed.append(value)
+    except OSError as e:
+        raise UsageError(f"pytest-order: cannot read order plan: {e}")
+    return hash_value, positions, messages
+
+
+def read_plan_components(path: str) -> dict[str, str]:
+    """
+    Read the order plan at the given path and return the weakly connected
+    components of its constraints. Each test that is connected to other
+    tests by constraints is mapped to the node id of the first test of
+    its component, while tests without constraints are omitted.
+    """
+    node_ids: list[str] = []
+    # the parent of each line in a union-find forest, where the root
+    # of each tree is the first line of the component
+    parents: list[int] = []
+
+    def root(position: int) -> int:
+        while parents[position] != position:
+            parents[position] = parents[parents[position]]
+            position = parents[position]
+        return position
+
+    try:
+        with open(path, encoding="utf-8") as plan:
+            if not plan.readline().startswith(PLAN_HEADER):
+                raise UsageError(f"pytest-order: '{path}' is not an order plan")
+            for position, line in enumerate(plan):
+                if line.startswith(PLAN_TRAILER):
+                    break
+                node_id, _, before = line.rstrip("\n").partition("\t")
+                node_ids.append(node_id)
+                parents.append(position)
+                for predecessor in before.split(",") if before else ():
+                    first, second = sorted((root(int(predecessor)), root(position)))
+                    parents[second] = first
+    except OSError as e:
+        raise UsageError(f"pytest-order: cannot read order plan: {e}")
+    # the roots of components with more than one test
+    connected = {
+        parent for position, parent in enumerate(parents) if parent != position
+    }
+    return {
+        node_id: node_ids[root(position)]
+        for position, node_id in enumerate(node_ids)
+        if parents[position] != position or position in connected
+    }
+
+
+def apply_plan(path: str, config: Config, items: list[Function]) -> bool:
+    """
+    Order the items in place as defined in the order plan at the given
+    path, and repeat the warnings and failures of the sorting.
+    Tests in the plan that are not collected are ignored.
+    Return False without changing the items if the plan has been created
+    with other ordering options, or if it does not contain all items.
+    """
+    hash_value, positions, messages = read_plan(path)
+    if hash_value != settings_hash(config):
+        sys.stdout.write(
+            "\nWARNING: the order plan has been created with other ordering "
+            "options - ignoring it."
+        )
+        return False
+    missing = [item.nodeid for item in items if item.nodeid not in positions]
+    if missing:
+        sys.stdout.write(
+            "\nWARNING: tests missing in the order plan: "
+            f"{' '.join(missing)} - ignoring the plan."
+        )
+        return False
+    sys.stdout.write("".join(messages.output))
+    for message in messages.warnings:
+        warn(message)
+    failed = set(messages.failed)
+    for item in items:
+        if item.nodeid in failed:
+            item.fixturenames.insert(0, "fail_after_cannot_order")
+    items.sort(key=lambda item: positions[item.nodeid])
+    if config.getoption("order_stats"):
+        sys.stdout.write(f"\npytest-order: {len(items)} tests in planned order.\n")
+    return True
+
+
+class SharedOrder(NamedTuple):
+    """
+    The order shared between the xdist workers, together with the
+    warnings shown while sorting and the collection indexes of the
+    items that fail because they could not be ordered.
+    """
+
+    permutation: list[int]
+    output: list[str]
+    warnings: list[str]
+    failed_items: list[int]
+
+
+class SharedPlan:
+    """
+    Shares the sort order between the xdist workers on the same host.
+    The first worker that has collected the items creates a lock file in
+    the plan directory passed by the controller, sorts the items, and
+    writes the permutation of the collection indexes as a binary array,
+    together with the collection hash and the warnings shown while sorting.
+    The other workers wait for the plan and apply it if their collection
+    hash matches, or sort the items themselves otherwise.
+    """
+
+    def __init__(self, plan_dir: str, config: Config, items: list[Function]) -> None:
+        self.path = os.path.join(plan_dir, SHARED_PLAN_NAME)
+        self.nr_items = len(items)
+        self.hash = collection_hash(config, items)
+        try:
+            os.close(
+                os.open(
+                    os.path.join(plan_dir, SHARED_PLAN_LOCK),
+                    os.O_CREAT | os.O_EXCL | os.O_WRONLY,
+                )
+            )
+            self.is_leader = True
+        except FileExistsError:
+            self.is_leader = False
+
+    @classmethod
+    def for_worker(
+        cls, config: Config, items: list[Function]
+    ) -> Optional["SharedPlan"]:
+        """Return the shared plan if running in a local xdist worker."""
+        workerinput = getattr(config, "workerinput", {})
+        plan_dir = workerinput.get("order_plan_dir")
+        if not plan_dir:
+            return None
+        return cls(plan_dir, config, items)
+
+    def publish(self, order: Optional[SharedOrder]) -> None:
+        """
+        Write the order, or an empty plan without hash if the other
+        workers shall sort the items themselves. The file is replaced
+        atomically, so that it is never read partially.
+        """
+        temp_path = f"{self.path}.{os.getpid()}"
+        with open(temp_path, "wb") as plan:
+            if order is None:
+                plan.write(b"\n")
+            else:
+                plan.write(f"{self.hash}\n".encode())
+                messages = {
+                    "output": order.output,
+                    "warnings": order.warnings,
+                    "failed": order.failed_items,
+                }
+                plan.write(f"{json.dumps(messages)}\n".encode())
+                array("i", order.permutation).tofile(plan)
+        os.replace(temp_path, self.path)
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[SharedOrder]:
+        """
+        Wait for the plan of the sorting worker and return its order,
+        or None if there is no valid plan for the same collection
+        after the given or default timeout.
+        """
+        if timeout is None:
+            timeout = SHARED_PLAN_TIMEOUT
+        deadline = time.monotonic() + timeout
+        while not os.path.exists(self.path):
+            if time.monotonic() > deadline:
+                return None
+            time.sleep(0.01)
+        permutation = array("i")
+        with open(self.path, "rb") as plan:
+            if plan.readline().decode().strip() != self.hash:
+                return None
+            messages = json.loads(plan.readline())
+            try:
+                permutation.fromfile(plan, self.nr_items)
+            except EOFError:
+                return None
+        return SharedOrder(
+            permutation.tolist(),
+            messages["output"],
+            messages["warnings"],
+            messages["failed"],
+        )
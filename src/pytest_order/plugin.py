@@ -1,13 +1,32 @@
-from collections.abc import Generator, Callable
+import os
+import shutil
+import sys
+import tempfile
+from collections.abc import Callable, Generator
+from typing import Optional
+from warnings import warn
 
 import pytest
-from pytest import Function
 from _pytest.config import Config
 from _pytest.config.argparsing import Parser
 from _pytest.main import Session
 from _pytest.mark import Mark
+from _pytest.nodes import Item
+from _pytest.reports import TestReport
+from pytest import Function
 
-from .sorter import Sorter
+from .durations import Duration, DurationHistory
+from .plan import (
+    GroupCache,
+    PlanCache,
+    PlanMessages,
+    SharedOrder,
+    SharedPlan,
+    apply_plan,
+    export_plan,
+)
+from .settings import Scope, Settings
+from .sorter import Sorter, has_ordering_markers
 
 
 def pytest_configure(config: Config) -> None:
@@ -135,6 +154,98 @@ def pytest_addoption(parser: Parser) -> None:
             "any tests if some tests with relative markers could not be ordered."
         ),
     )
+    group.addoption(
+        "--minimal-cycle-breaking",
+        action="store_true",
+        dest="minimal_cycle_breaking",
+        help=(
+            "If set, only a minimal set of relative markers is ignored to break "
+            "cyclic markers, preferring before/after markers over dependencies, "
+            "instead of ignoring all markers in the cycle."
+        ),
+    )
+    group.addoption(
+        "--order-cache",
+        action="store_true",
+        dest="order_cache",
+        help=(
+            "If set, the order of the tests is saved in the pytest cache and "
+            "reused as long as the tests and their markers do not change."
+        ),
+    )
+    group.addoption(
+        "--order-export",
+        action="store",
+        dest="order_export",
+        metavar="PATH",
+        help=(
+            "If set, the resulting order of the tests is written to the given "
+            "path as an order plan that can be used with --order-plan."
+        ),
+    )
+    group.addoption(
+        "--order-plan",
+        action="store",
+        dest="order_plan",
+        metavar="PATH",
+        help=(
+            "If set, the tests are ordered as defined in the order plan at "
+            "the given path, written before using --order-export."
+        ),
+    )
+    group.addoption(
+        "--order-dist",
+        action="store_true",
+        dest="order_dist",
+        help=(
+            "If set together with pytest-xdist, tests connected by relative "
+            "markers or dependencies are executed on the same worker in the "
+            "sorted order, while all other tests are distributed freely. "
+            "Replaces the distribution mode set by --dist."
+        ),
+    )
+    group.addoption(
+        "--order-stats",
+        action="store_true",
+        dest="order_stats",
+        help=(
+            "If set, the number of order scope groups is shown together with "
+            "the way their tests have been sorted."
+        ),
+    )
+    group.addoption(
+        "--order-workers",
+        action="store",
+        type=int,
+        dest="order_workers",
+        metavar="N",
+        help=(
+            "If set to a number greater than 1, the order scope groups are "
+            "sorted in parallel by the given number of worker processes. "
+            "Only useful with --order-scope or --order-scope-level."
+        ),
+    )
+    group.addoption(
+        "--order-durations",
+        action="store_true",
+        dest="order_durations",
+        help=(
+            "If set, the durations of the tests are recorded in the pytest "
+            "cache as a weighted average over the last test runs."
+        ),
+    )
+    group.addoption(
+        "--order-by-duration",
+        action="store",
+        dest="order_by_duration",
+        choices=["longest-first"],
+        help=(
+            "If set to 'longest-first', tests without ordinal, relative "
+            "markers or dependencies are reordered inside their order scope "
+            "by their duration recorded in previous test runs, starting with "
+            "the longest. The durations are recorded as with --order-durations."
+        ),
+    )
     group.addoption(
         "--order-after-ff",
         action="store_true",
@@ -190,15 +301,302 @@ class OrderingPlugin:
     the CLI is parsed.
     """
 
+    def __init__(self) -> None:
+        # the directory the xdist workers write their order plans to
+        self.plan_dir: Optional[str] = None
+        # the durations of the previous test runs, if recorded
+        self.duration_history: Optional[DurationHistory] = None
+        # set if the durations of the current run are recorded
+        self.record_durations = False
+        # the durations of the tests in the current run
+        self.durations: dict[str, float] = {}
+        # the tests in the current run that have been called
+        self.called_tests: set[str] = set()
+        # the node ids collected in the current run for each test file
+        self.collected_tests: dict[str, set[str]] = {}
+        # the test files from which only some tests are collected
+        self.partial_paths: set[str] = set()
+        # set if tests may be left out of the collected test files
+        self.filtered_collection = False
+
+    def duration(self, node_id: str) -> Optional[Duration]:
+        """
+        Return the recorded duration of the test with the given node id,
+        or None if the durations are not recorded or the test is not known.
+        """
+        if self.duration_history is None:
+            return None
+        return self.duration_history.get(node_id)
+
+    def pytest_sessionstart(self, session: Session) -> None:
+        config = session.config
+        if config.getoption("order_durations") or config.getoption("order_by_duration"):
+            self.duration_history = DurationHistory.for_config(config)
+            if self.duration_history is None:
+                if config.getoption("order_by_duration"):
+                    message = (
+                        "The tests cannot be ordered by duration without the "
+                        "cacheprovider plugin, keeping the collection order."
+                    )
+                else:
+                    message = (
+                        "The durations of the tests cannot be recorded "
+                        "without the cacheprovider plugin."
+                    )
+                config.issue_config_time_warning(
+                    pytest.PytestConfigWarning(message), stacklevel=2
+                )
+            # the reports of the xdist workers are also sent to the
+            # controller, so the durations are only recorded there
+            self.record_durations = self.duration_history is not None and not (
+                hasattr(config, "workerinput")
+            )
+            invocation_dir = str(config.invocation_params.dir)
+            self.partial_paths = {
+                os.path.abspath(os.path.join(invocation_dir, arg.partition("::")[0]))
+                for arg in config.args
+                if "::" in arg
+            }
+            # the last failed and stepwise plugins may filter the tests
+            # of a collected file, so only the test files are checked then
+            self.filtered_collection = any(
+                config.getoption(name, False)
+                for name in ("lf", "failedfirst", "stepwise", "stepwise_skip")
+            )
+
+    def pytest_itemcollected(self, item: Item) -> None:
+        if (
+            self.record_durations
+            and not self.filtered_collection
+            and item_path(item) not in self.partial_paths
+        ):
+            path = item.nodeid.partition("::")[0]
+            self.collected_tests.setdefault(path, set()).add(item.nodeid)
+
+    def pytest_runtest_logreport(self, report: TestReport) -> None:
+        if not self.record_durations:
+            return
+        self.durations[report.nodeid] = (
+            self.durations.get(report.nodeid, 0.0) + report.duration
+        )
+        if report.when == "call":
+            self.called_tests.add(report.nodeid)
+
+    def pytest_sessionfinish(self, session: Session) -> None:
+        history = self.duration_history
+        if history is None or not self.record_durations:
+            return
+        for node_id, duration in self.durations.items():
+            # skipped tests do not show their real duration
+            if node_id in self.called_tests:
+                history.add(node_id, duration)
+        history.prune(
+            NodeFileChecker(str(session.config.rootpath), self.collected_tests)
+        )
+        history.save()
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_configure_node(self, node) -> None:
+        """Pass the directory for the shared order plans to the xdist workers."""
+        # the plans can only be shared by workers on the same host
+        if node.gateway.spec.popen and not node.gateway.spec.chdir:
+            if self.plan_dir is None:
+                self.plan_dir = tempfile.mkdtemp(prefix="pytest-order-")
+            node.workerinput["order_plan_dir"] = self.plan_dir
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_xdist_make_scheduler(self, config: Config, log):
+        if config.getoption("order_dist"):
+            from .scheduler import OrderScheduling
+
+            return OrderScheduling(config, log, self.plan_dir)
+        return None
+
+    def pytest_unconfigure(self, config: Config) -> None:
+        if self.plan_dir is not None:
+            shutil.rmtree(self.plan_dir, ignore_errors=True)
+            self.plan_dir = None
+
+
+def item_path(item: Item) -> str:
+    """Return the path of the test file, using ``fspath`` before pytest 7."""
+    path = getattr(item, "path", None)
+    return str(path if path is not None else item.fspath)
+
+
+class NodeFileChecker:
+    """
+    Checks if the test with a node id still exists. For test files that
+    have been collected completely in the current run, the test has to be
+    collected, otherwise only the test file has to exist.
+    """
+
+    def __init__(self, rootdir: str, collected_tests: dict[str, set[str]]) -> None:
+        self.rootdir = rootdir
+        self.collected_tests = collected_tests
+        self.paths: dict[str, bool] = {}
+
+    def __call__(self, node_id: str) -> bool:
+        path = node_id.partition("::")[0]
+        if path in self.collected_tests:
+            return node_id in self.collected_tests[path]
+        exists = self.paths.get(path)
+        if exists is None:
+            exists = self.paths[path] = os.path.exists(os.path.join(self.rootdir, path))
+        return exists
+
 
 def modify_items(session: Session, config: Config, items: list[Function]) -> None:
-    sorter = Sorter(config, items)
-    items[:] = sorter.sort_items()
+    sort_items(config, items)
 
 
 def modify_items_gen(
     session: Session, config: Config, items: list[Function]
 ) -> Generator[None]:
     yield
-    sorter = Sorter(config, items)
+    sort_items(config, items)
+
+
+def sort_items(config: Config, items: list[Function]) -> None:
+    """
+    Sort the items in place. A given order plan is applied instead if it
+    contains all items. The resulting order is exported if requested, or
+    if it is needed by the xdist scheduler for --order-dist.
+    """
+    export_paths = [config.getoption("order_export")]
+    workerinput = getattr(config, "workerinput", {})
+    if workerinput.get("order_plan_dir") and config.getoption("order_dist"):
+        # the plan is read by the xdist scheduler of the controller
+        export_paths.append(
+            os.path.join(
+                workerinput["order_plan_dir"], f"{workerinput['workerid']}.plan"
+            )
+        )
+    export_paths = [path for path in export_paths if path]
+    plan_path = config.getoption("order_plan")
+    if plan_path and apply_plan(plan_path, config, items):
+        for path in export_paths:
+            if path != plan_path:
+                shutil.copyfile(plan_path, path)
+        return
+    sorter = None
+    # all items may be reordered by duration or into order groups,
+    # even without any markers
+    if (
+        has_ordering_markers(config, items)
+        or config.getoption("order_by_duration")
+        or has_order_groups(config)
+    ):
+        shared_plan = SharedPlan.for_worker(config, items)
+        if shared_plan is not None and not shared_plan.is_leader:
+            order = shared_plan.wait()
+            if order is not None:
+                apply_shared_order(config, items, order)
+                return
+        collected_items = list(items)
+        try:
+            # the constraints are needed for exporting, and the durations
+            # change in each run, so the cached order cannot be used then
+            sorter = sort_marked_items(
+                config,
+                items,
+                use_cached_order=not export_paths
+                and not config.getoption("order_by_duration"),
+            )
+        except Exception:
+            if shared_plan is not None and shared_plan.is_leader:
+                shared_plan.publish(None)
+            raise
+        if shared_plan is not None and shared_plan.is_leader:
+            positions = {item: index for index, item in enumerate(collected_items)}
+            permutation = [positions[item] for item in items]
+            if sorter is None:
+                shared_plan.publish(SharedOrder(permutation, [], [], []))
+            else:
+                shared_plan.publish(
+                    SharedOrder(
+                        permutation,
+                        sorter.output,
+                        sorter.warnings,
+                        sorter.failed_items,
+                    )
+                )
+    else:
+        # the settings are not used, but invalid options
+        # shall be reported as if the items were sorted
+        Settings(config)
+    if export_paths:
+        predecessors = sorter.predecessors() if sorter else [[] for _ in items]
+        node_ids = [item.nodeid for item in items]
+        messages = None
+        if sorter is not None:
+            messages = PlanMessages(
+                sorter.output,
+                sorter.warnings,
+                [sorter.items[index].node_id for index in sorter.failed_items],
+            )
+        for path in export_paths:
+            export_plan(path, config, node_ids, predecessors, messages)
+
+
+def apply_shared_order(
+    config: Config, items: list[Function], order: SharedOrder
+) -> None:
+    """
+    Order the items in place as sorted by another xdist worker,
+    and repeat the warnings and failures of the sorting worker.
+    """
+    # invalid options are reported by each worker
+    Settings(config)
+    sys.stdout.write("".join(order.output))
+    for message in order.warnings:
+        warn(message)
+    for index in order.failed_items:
+        items[index].fixturenames.insert(0, "fail_after_cannot_order")
+    items[:] = [items[index] for index in order.permutation]
+
+
+def has_order_groups(config: Config) -> bool:
+    """
+    Return True if the items are sorted into order groups inside the
+    order scope, which may change the order even without any markers.
+    """
+    scope = Settings.valid_scopes.get(config.getoption("order_scope"), Scope.SESSION)
+    group_scope = Settings.valid_scopes.get(
+        config.getoption("order_group_scope"), scope
+    )
+    return group_scope.value < scope.value
+
+
+def sort_marked_items(
+    config: Config, items: list[Function], use_cached_order: bool
+) -> Optional[Sorter]:
+    """
+    Sort the items in place, reusing the cached order of the last test
+    run if the cache is used and the items have not changed.
+    Return the used sorter, or None if the cached order has been used.
+    """
+    plan_cache = group_cache = None
+    if config.getoption("order_cache") and getattr(config, "cache", None):
+        plan_cache = PlanCache(config, items)
+        permutation = plan_cache.load() if use_cached_order else None
+        if permutation is not None:
+            # the settings are not used, but invalid options
+            # shall be reported as if the items were sorted
+            Settings(config)
+            items[:] = [items[index] for index in permutation]
+            if config.getoption("order_stats"):
+                sys.stdout.write(
+                    f"\npytest-order: {len(items)} tests in cached order.\n"
+                )
+            return None
+        group_cache = GroupCache(config)
+    plugin = config.pluginmanager.get_plugin("orderingplugin")
+    duration_history = plugin.duration_history if plugin is not None else None
+    sorter = Sorter(config, items, group_cache, duration_history)
     items[:] = sorter.sort_items()
+    # the order is only cached if all markers could be handled, as
+    # warnings and failures for the other markers have to be repeated
+    if plan_cache is not None and not sorter.has_warnings:
+        plan_cache.save(sorter.permutation)
+    return sorter
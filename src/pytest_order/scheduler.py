@@ -0,0 +1,86 @@
+import os
+from typing import TYPE_CHECKING, Optional
+
+from _pytest.config import Config
+from xdist.scheduler import LoadScopeScheduling
+
+from .plan import read_plan_components
+
+if TYPE_CHECKING:
+    from xdist.remote import Producer
+
+
+class OrderScheduling(LoadScopeScheduling):
+    """
+    Distributes the tests to the xdist workers, so that tests connected by
+    relative markers or dependencies are executed on the same worker in the
+    order given by the collection, while all other tests are distributed
+    freely.
+    The connected components of the constraints are read from the order
+    plan written by one of the workers, and each component is handled as
+    a single scope by the load scope scheduling. If no order plan is
+    available, the tests are grouped by module and class as with
+    ``--dist=loadscope``, so that connected tests in the same module
+    are still executed on the same worker.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        log: Optional["Producer"] = None,
+        plan_dir: Optional[str] = None,
+    ) -> None:
+        # without a log, the load scope log is used, as the producer
+        # class is only available in newer xdist versions
+        super().__init__(config, log)
+        if log is not None:
+            self.log = log.ordersched
+        self.plan_dir = plan_dir
+        # the connected components from the order plan,
+        # or None if no order plan has been found
+        self.components: Optional[dict[str, str]] = None
+
+    def schedule(self) -> None:
+        if self.collection is None:
+            self.components = self.read_components()
+            if self.components is None:
+                self.warn(
+                    "WARNING: no order plan written by the xdist workers - "
+                    "distributing the tests by module and class."
+                )
+        super().schedule()
+
+    def read_components(self) -> Optional[dict[str, str]]:
+        """
+        Return the connected components from the order plan of the first
+        worker that has written one, or None if there is no such plan,
+        as is the case for remote workers or workers running in another
+        directory.
+        """
+        if self.plan_dir is None:
+            return None
+        # workers that used the shared order of the first
+        # worker do not write an order plan
+        for node in self.registered_collections:
+            plan_path = os.path.join(
+                self.plan_dir, f"{node.workerinput['workerid']}.plan"
+            )
+            if os.path.exists(plan_path):
+                return read_plan_components(plan_path)
+        return None
+
+    def warn(self, message: str) -> None:
+        terminal = self.config.pluginmanager.get_plugin("terminalreporter")
+        if terminal is not None:
+            terminal.write_line(message)
+
+    def _split_scope(self, nodeid: str) -> str:
+        """
+        Return the node id of the first test in the component of connected
+        tests the given test belongs to, or the node id itself for tests
+        without relative markers or dependencies.
+        Without an order plan, return the module or class of the test.
+        """
+        if self.components is None:
+            return super()._split_scope(nodeid)
+        return self.components.get(nodeid, nodeid)
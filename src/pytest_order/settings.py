@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import Optional
 from warnings import warn
 
 from _pytest.config import Config
@@ -29,6 +30,10 @@ class Settings:
         self.fail_all_on_failed_ordering: bool = config.getoption(
             "fail_all_on_failed_ordering"
         )
+        self.minimal_cycle_breaking: bool = config.getoption("minimal_cycle_breaking")
+        self.order_stats: bool = config.getoption("order_stats")
+        self.order_workers: int = config.getoption("order_workers") or 1
+        self.order_by_duration: Optional[str] = config.getoption("order_by_duration")
         scope: str = config.getoption("order_scope")
         if scope in self.valid_scopes:
             self.scope: Scope = self.valid_scopes[scope]
@@ -1,16 +1,32 @@
-import re
 import sys
-from collections import OrderedDict
-from contextlib import suppress
-from typing import Optional, cast
+from array import array
+from collections import Counter
+from collections.abc import Hashable, Iterable, Sequence
+from typing import Optional
 from warnings import warn
 
 from _pytest.config import Config
 from _pytest.mark import Mark
 from pytest import Function, UsageError
 
-from .item import Item, ItemList, ItemGroup, filter_marks, move_item, RelativeMark
-from .settings import Settings, Scope
+from .durations import DurationHistory
+from .graph import AFTER, DEPENDENCY, NO_ORDER, ConstraintGraph, ConstraintView
+from .item import (
+    UNORDERED_RANK,
+    Item,
+    ItemGroup,
+    ItemIndex,
+    ItemList,
+    order_value,
+    ordinal_rank,
+)
+from .labels import LabelIndex
+from .plan import GroupCache, group_hash
+from .settings import Scope, Settings
+
+# the sorted items, the sort strategy and the unhandled items
+# and constraint cycles of a sorted scope group
+ScopeResult = tuple[list[int], str, list[tuple[list[int], list[list[int]]]]]
 
 orders_map = {
     "first": 0,
@@ -37,64 +53,328 @@ class Sorter:
     Sort all items according to the given configuration.
     """
 
-    def __init__(self, config: Config, items: list[Function]) -> None:
+    def __init__(
+        self,
+        config: Config,
+        items: list[Function],
+        group_cache: Optional[GroupCache] = None,
+        duration_history: Optional[DurationHistory] = None,
+    ) -> None:
         self.settings: Settings = Settings(config)
+        self.group_cache = group_cache
+        self.duration_history = duration_history
         self.items: list[Item] = [Item(item, idx) for idx, item in enumerate(items)]
-        self.node_ids: dict[str, Item] = OrderedDict()
-        self.node_id_last: dict[str, list[str]] = {}
-        for item in self.items:
-            self.node_ids[item.node_id] = item
-            last_part = item.node_id.rpartition("::")[2]
-            if "[" in last_part:
-                last_part = last_part.rpartition("[")[0]
-            # save last nodeid component to avoid to iterate over all
-            # items for each label
-            self.node_id_last.setdefault(last_part, []).append(item.node_id)
-        self.rel_marks: list[RelativeMark[Item]] = []
-        self.dep_marks: list[RelativeMark[Item]] = []
+        self.labels = LabelIndex(self.items)
+        self.graph = ConstraintGraph(len(self.items))
+        # the indexes of the items with an ordinal
+        self.ordered_items: list[int] = []
+        # the collection indexes of the sorted items
+        self.permutation: list[int] = []
+        # set if any markers could not be handled, so that the
+        # order depends on more than the markers themselves
+        self.has_warnings = False
+        # the warnings written to stdout and issued as Python warnings,
+        # and the indexes of the items that fail for failed ordering,
+        # so that they can be repeated by other xdist workers
+        self.output: list[str] = []
+        self.warnings: list[str] = []
+        self.failed_items: list[int] = []
 
     def sort_items(self) -> list[Function]:
         """
         Do the actual sorting and return the sorted items.
+        The items are sorted as a permutation of their collection indexes,
+        and are only mapped back to the test items at the end.
         """
         self.collect_markers()
-        if self.settings.scope == Scope.SESSION:
-            if self.settings.scope_level > 0:
-                dir_groups = directory_item_groups(
-                    self.items, self.settings.scope_level
-                )
-                sorted_list = []
-                for items in dir_groups.values():
-                    sorter = ScopeSorter(
-                        self.settings, items, self.rel_marks, self.dep_marks
-                    )
-                    sorted_list.extend(sorter.sort_items())
-            else:
-                sorter = ScopeSorter(
-                    self.settings,
-                    self.items,
-                    self.rel_marks,
-                    self.dep_marks,
-                    session_scope=True,
+        index = ItemIndex.from_items(self.items)
+        scope_groups = self.scope_groups(index)
+        constraints, cross_scope_edges = self.graph.partition(scope_groups)
+        if cross_scope_edges:
+            self.warn_about_cross_scope_marks(cross_scope_edges)
+        mark_counts = self.mark_counts(scope_groups, constraints, index)
+        sorted_groups: list[list[int]] = []
+        strategies: list[str] = []
+        # the positions, items, constraints and cache keys
+        # of the groups that have to be sorted
+        unsorted_groups: list[tuple[int, list[int], ConstraintView, Optional[str]]] = []
+        group_keys = order_group_keys(self.settings, index)
+        for key, items in scope_groups.items():
+            if not mark_counts.get(key) and is_grouped(items, group_keys):
+                # nothing to sort - the items are kept in collection order
+                sorted_groups.append(items)
+                strategies.append("without markers")
+                continue
+            key_hash = None
+            if self.group_cache is not None:
+                key_hash = self.group_hash(items, constraints[key], index)
+                permutation = self.group_cache.get(key_hash, len(items))
+                if permutation is not None:
+                    sorted_groups.append([items[position] for position in permutation])
+                    strategies.append("cached")
+                    continue
+            unsorted_groups.append(
+                (len(sorted_groups), items, constraints[key], key_hash)
+            )
+            sorted_groups.append(items)
+            strategies.append("")
+        results = self.sort_scope_groups(
+            [
+                (items, group_constraints)
+                for _, items, group_constraints, _ in unsorted_groups
+            ],
+            index,
+        )
+        for (position, items, _, key_hash), (sorted_items, strategy, unhandled) in zip(
+            unsorted_groups, results
+        ):
+            sorted_groups[position] = sorted_items
+            strategies[position] = strategy
+            for unhandled_items, cycles in unhandled:
+                self.print_unhandled_items(unhandled_items, cycles)
+            if self.group_cache is not None and key_hash is not None and not unhandled:
+                positions = {item: position for position, item in enumerate(items)}
+                self.group_cache.add(
+                    key_hash, [positions[item] for item in sorted_items]
                 )
-                sorted_list = sorter.sort_items()
-        elif self.settings.scope == Scope.MODULE:
-            module_groups = module_item_groups(self.items)
-            sorted_list = []
-            for module_items in module_groups.values():
-                sorter = ScopeSorter(
-                    self.settings, module_items, self.rel_marks, self.dep_marks
+        if self.group_cache is not None:
+            self.group_cache.save()
+        if self.settings.order_stats:
+            self.print_statistics(Counter(strategies))
+        self.permutation = [item for items in sorted_groups for item in items]
+        if self.settings.order_by_duration == "longest-first":
+            self.permutation = self.sort_free_items_by_duration(self.permutation, index)
+        return [self.items[item].item for item in self.permutation]
+
+    def sort_free_items_by_duration(
+        self, sorted_list: list[int], index: ItemIndex
+    ) -> list[int]:
+        """
+        Reorder the items without ordinal, relative markers and dependencies
+        by their recorded duration, starting with the longest, where items
+        without recorded duration come last. The free items of each scope
+        group, or of each order group if order groups are used, are only
+        moved to the positions of other free items of the same group, so
+        that the other items and all groups keep their positions.
+        """
+        if self.settings.group_scope.value >= self.settings.scope.value:
+            group_keys: Sequence[Hashable] = [
+                self.scope_key(index, item) for item in range(len(self.items))
+            ]
+        elif self.settings.group_scope == Scope.CLASS:
+            group_keys = index.class_keys
+        else:
+            group_keys = index.module_keys
+        constrained = set(self.graph.anchors)
+        constrained.update(self.graph.targets)
+        # the positions of the free items in each group
+        free_positions: dict[Hashable, list[int]] = {}
+        for position, item in enumerate(sorted_list):
+            if (
+                index.orders[item] == NO_ORDER
+                and item not in constrained
+                and "dependency" not in self.items[item].item.keywords
+            ):
+                free_positions.setdefault(group_keys[item], []).append(position)
+        history = self.duration_history
+        result = list(sorted_list)
+        for positions in free_positions.values():
+            durations: dict[int, float] = {}
+            for position in positions:
+                item = sorted_list[position]
+                duration = (
+                    history.get(self.items[item].node_id)
+                    if history is not None
+                    else None
                 )
-                sorted_list.extend(sorter.sort_items())
-        else:  # class scope
-            class_groups = class_item_groups(self.items)
-            sorted_list = []
-            for class_items in class_groups.values():
-                sorter = ScopeSorter(
-                    self.settings, class_items, self.rel_marks, self.dep_marks
+                durations[item] = duration.mean if duration is not None else 0.0
+            free_items = sorted(durations, key=durations.__getitem__, reverse=True)
+            for position, item in zip(positions, free_items):
+                result[position] = item
+        return result
+
+    def predecessors(self) -> list[list[int]]:
+        """
+        Return for each sorted item the positions of the items that are
+        executed before it because of a relative marker or dependency.
+        """
+        position = array("i", [0]) * len(self.permutation)
+        for index, item in enumerate(self.permutation):
+            position[item] = index
+        predecessors: list[list[int]] = [[] for _ in self.permutation]
+        for edge in range(len(self.graph)):
+            first, second = self.graph.execution_order(edge)
+            # constraints between scopes or in cycles may not be satisfied
+            if position[first] < position[second]:
+                predecessors[position[second]].append(position[first])
+        for items in predecessors:
+            items.sort()
+        return predecessors
+
+    def sort_scope_groups(
+        self, groups: list[tuple[list[int], ConstraintView]], index: ItemIndex
+    ) -> list[ScopeResult]:
+        """
+        Sort the items of the given scope groups, using a pool of workers
+        if configured, and return the sorted items, the sort strategy and
+        the unhandled items of each group.
+        """
+        workers = self.settings.order_workers
+        if workers > 1 and len(groups) > 1:
+            from .parallel import sort_in_parallel
+
+            return sort_in_parallel(self.settings, groups, index, workers)
+        results: list[ScopeResult] = []
+        for items, constraints in groups:
+            sorter = ScopeSorter(self.settings, items, constraints, index)
+            results.append((sorter.sort_items(), sorter.strategy, sorter.unhandled))
+        return results
+
+    def scope_groups(self, index: ItemIndex) -> dict[Hashable, list[int]]:
+        """
+        Split the item indexes into the groups that are sorted separately
+        according to the order scope.
+        """
+        indexes = range(len(self.items))
+        if self.settings.scope == Scope.MODULE:
+            return item_groups(indexes, index.module_keys)
+        if self.settings.scope == Scope.CLASS:
+            return item_groups(indexes, index.class_keys)
+        if self.settings.scope_level > 0:
+            return directory_item_groups(self.items, self.settings.scope_level)
+        return {"": list(indexes)}
+
+    def scope_key(self, index: ItemIndex, item: int) -> Hashable:
+        """Return the key of the scope group the given item belongs to."""
+        if self.settings.scope == Scope.MODULE:
+            return index.module_keys[item]
+        if self.settings.scope == Scope.CLASS:
+            return index.class_keys[item]
+        if self.settings.scope_level > 0:
+            return self.items[item].parts.path[: self.settings.scope_level]
+        return ""
+
+    def mark_counts(
+        self,
+        scope_groups: dict[Hashable, list[int]],
+        constraints: dict[Hashable, ConstraintView],
+        index: ItemIndex,
+    ) -> dict[Hashable, int]:
+        """
+        Return the number of ordinals and relative constraints in each scope
+        group, counted from the ordered items and the constraint edges
+        without visiting the other items.
+        """
+        counts = {key: len(constraints[key]) for key in scope_groups}
+        for item in self.ordered_items:
+            counts[self.scope_key(index, item)] += 1
+        return counts
+
+    def group_hash(
+        self, items: list[int], constraints: ConstraintView, index: ItemIndex
+    ) -> str:
+        """
+        Return the hash identifying the sort order of a scope group, with
+        the edges given relative to the position of their items in the group,
+        ordered by their sort key.
+        """
+        graph = self.graph
+        positions = {item: position for position, item in enumerate(items)}
+        return group_hash(
+            (self.items[item].node_id for item in items),
+            (index.orders[item] for item in items),
+            (
+                (
+                    positions[graph.anchors[edge]],
+                    positions[graph.targets[edge]],
+                    graph.flags[edge],
+                    graph.keys[edge] < 0,
                 )
-                sorted_list.extend(sorter.sort_items())
-        return [item.item for item in sorted_list]
+                for edge in sorted(constraints.edges(), key=graph.keys.__getitem__)
+            ),
+        )
+
+    def print_statistics(self, strategies: Counter[str]) -> None:
+        """Print how many scope groups have been sorted in which way."""
+        details = ", ".join(
+            f"{count} {strategy}" for strategy, count in strategies.items()
+        )
+        sys.stdout.write(
+            f"\npytest-order: {len(self.items)} tests in "
+            f"{sum(strategies.values())} scope groups: {details}.\n"
+        )
+
+    def write_warning(self, text: str) -> None:
+        self.has_warnings = True
+        self.output.append(text)
+        sys.stdout.write(text)
+
+    def issue_warning(self, message: str) -> None:
+        self.has_warnings = True
+        self.warnings.append(message)
+        warn(message)
+
+    def fail_after_cannot_order(self, item: Item) -> None:
+        self.failed_items.append(item.collection_index)
+        item.item.fixturenames.insert(0, "fail_after_cannot_order")
+
+    def warn_about_cross_scope_marks(self, edges: list[int]) -> None:
+        node_ids = list(
+            dict.fromkeys(
+                self.items[self.graph.targets[edge]].node_id for edge in edges
+            )
+        )
+        self.write_warning(
+            "\nWARNING: cannot execute tests relative to tests outside of "
+            f"their order scope: {' '.join(node_ids)} - ignoring the markers."
+        )
+
+    def print_unhandled_items(
+        self, indexes: list[int], cycles: list[list[int]]
+    ) -> None:
+        failed_items = [self.items[index] for index in indexes]
+        msg = " ".join([item.node_id for item in failed_items])
+        cycle_msg = "".join(
+            f"WARNING: constraint cycle: {self.format_cycle(cycle)}\n"
+            for cycle in cycles
+        )
+        self.write_warning("\nWARNING: cannot execute test relative to others: ")
+        self.write_warning(msg)
+        if self.settings.fail_all_on_failed_ordering:
+            sys.stdout.write("\n" + cycle_msg)
+            raise UsageError(
+                f"pytest-order: cannot execute test relative to others: {msg}"
+            )
+        if self.settings.error_on_failed_ordering:
+            self.write_warning(" - ignoring the marker.\n")
+        else:
+            self.write_warning(".\n")
+        self.write_warning(cycle_msg)
+        sys.stdout.flush()
+        if self.settings.error_on_failed_ordering:
+            for item in failed_items:
+                self.fail_after_cannot_order(item)
+
+    def format_cycle(self, edges: list[int]) -> str:
+        """
+        Return the node ids along a constraint cycle in execution order,
+        each arrow labeled with the marker that created the constraint.
+        Tests that are only connected by belonging to the same order group
+        are separated by a tilde.
+        """
+        first_item = self.graph.execution_order(edges[0])[0]
+        chain = [self.items[first_item].node_id]
+        last_item = first_item
+        for edge in edges:
+            item, next_item = self.graph.execution_order(edge)
+            if item != last_item:
+                chain.append(f"~ {self.items[item].node_id}")
+            marker = self.graph.marker_name(edge)
+            chain.append(f"-[{marker}]-> {self.items[next_item].node_id}")
+            last_item = next_item
+        if last_item != first_item:
+            chain.append(f"~ {self.items[first_item].node_id}")
+        return " ".join(chain)
 
     def mark_binning(
         self,
@@ -136,10 +416,9 @@ class Sorter:
             dependent_mark = mark.kwargs.get("depends")
             if dependent_mark:
                 scope = scope_from_name(mark.kwargs.get("scope", "module"))
-                prefix = scoped_node_id(item.node_id, scope)
+                prefix = item.scoped_node_id(scope)
                 for name in dependent_mark:
                     dep_marks.setdefault((name, scope, prefix), []).append(item)
-                    item.inc_rel_marks()
             # we always collect the names of the dependent items, because
             # we need them in both cases
             name_mark = mark.kwargs.get("name")
@@ -162,13 +441,11 @@ class Sorter:
             elif order in orders_map:
                 order = orders_map[order]
             else:
-                warn(f"Unknown order attribute:'{order}'")
+                self.issue_warning(f"Unknown order attribute:'{order}'")
                 order = None
         if item.order is None:
             item.order = order
         self.handle_relative_marks(item, mark)
-        if order is not None:
-            item.nr_rel_items = 0
 
     def items_from_label(self, label: str, item: Item, is_cls_mark: bool) -> list[Item]:
         """
@@ -177,40 +454,10 @@ class Sorter:
         in the case of a matching parametrized test, or no item in case of
         an invalid label.
         """
-        item_id = item.node_id
-        label_len = len(label)
-        last_comp = label.split("/")[-1].split("::")[-1]
-        items = []
-        with suppress(KeyError):
-            node_ids = self.node_id_last[last_comp]
-            for node_id in node_ids:
-                if node_id.endswith(label):
-                    id_start = node_id[:-label_len]
-                elif node_id.endswith("]") and node_id.rpartition("[")[0].endswith(
-                    label
-                ):
-                    id_start = node_id.rpartition("[")[0][:-label_len]
-                else:
-                    continue
-                if is_cls_mark and id_start.count("::") == 2:
-                    continue
-                if item_id.startswith(id_start):
-                    items.append(self.node_ids[node_id])
-
-        return items
+        return self.labels.items_for_label(label, item, is_cls_mark)
 
     def items_from_class_label(self, label: str, item: Item) -> list[Item]:
-        items = []
-        item_id = item.node_id
-        label_len = len(label)
-        for node_id in self.node_ids:
-            if node_id.count("::") == 2:
-                cls_index = node_id.rindex("::")
-                if node_id[:cls_index].endswith(label):
-                    id_start = node_id[: cls_index - label_len]
-                    if item_id.startswith(id_start):
-                        items.append(self.node_ids[node_id])
-        return items
+        return self.labels.items_for_class_label(label, item)
 
     def handle_before_or_after_mark(
         self, item: Item, mark: Mark, marker_name: str, is_after: bool
@@ -227,23 +474,23 @@ class Sorter:
         items_for_label = self.items_from_label(marker_name, item, is_cls_mark)
         if items_for_label:
             for item_for_label in items_for_label:
-                rel_mark = RelativeMark(item_for_label, item, move_after=is_after)
-                if is_after or not is_cls_mark:
-                    self.rel_marks.append(rel_mark)
-                else:
-                    self.rel_marks.insert(0, rel_mark)
-                item.inc_rel_marks()
+                self.graph.add_edge(
+                    item_for_label.collection_index,
+                    item.collection_index,
+                    move_after=is_after,
+                    prepend=not is_after and is_cls_mark,
+                )
             return True
         else:
             if is_mark_for_class():
                 items = self.items_from_class_label(marker_name, item)
                 for item_for_label in items:
-                    rel_mark = RelativeMark(item_for_label, item, move_after=is_after)
-                    if is_after:
-                        self.rel_marks.append(rel_mark)
-                    else:
-                        self.rel_marks.insert(0, rel_mark)
-                    item.inc_rel_marks()
+                    self.graph.add_edge(
+                        item_for_label.collection_index,
+                        item.collection_index,
+                        move_after=is_after,
+                        prepend=not is_after,
+                    )
                 return len(items) > 0
         return False
 
@@ -270,21 +517,24 @@ class Sorter:
         return has_relative_marks
 
     def warn_about_unknown_test(self, item: Item, rel_mark: str) -> None:
+        self.has_warnings = True
         msg = f"cannot execute '{item.item.name}' relative to others: '{rel_mark}'"
         if self.settings.fail_all_on_failed_ordering:
             raise UsageError(f"pytest-order: {msg}")
         if self.settings.error_on_failed_ordering:
-            item.item.fixturenames.insert(0, "fail_after_cannot_order")
+            self.fail_after_cannot_order(item)
             ignore_msg = ""
         else:
             ignore_msg = " - ignoring the marker"
-        sys.stdout.write(f"\nWARNING: {msg}{ignore_msg}.")
+        self.write_warning(f"\nWARNING: {msg}{ignore_msg}.")
 
     def collect_markers(self) -> None:
         aliases: dict[str, list[Item]] = {}
         dep_marks: dict[tuple[str, Scope, str], list[Item]] = {}
         for item in self.items:
             self.mark_binning(item, dep_marks, aliases)
+            if item.order is not None:
+                self.ordered_items.append(item.collection_index)
         self.resolve_dependency_markers(dep_marks, aliases)
 
     def resolve_dependency_markers(
@@ -296,17 +546,25 @@ class Sorter:
             if name in aliases:
                 for item in items:
                     alias = self.matching_alias(aliases[name], item)
-                    self.dep_marks.append(RelativeMark(alias, item, move_after=True))
+                    self.graph.add_edge(
+                        alias.collection_index,
+                        item.collection_index,
+                        move_after=True,
+                        is_dependency=True,
+                    )
             else:
                 label = "::".join((prefix, name))
                 if label in aliases:
                     for item in items:
                         alias = self.matching_alias(aliases[label], item)
-                        self.dep_marks.append(
-                            RelativeMark(alias, item, move_after=True)
+                        self.graph.add_edge(
+                            alias.collection_index,
+                            item.collection_index,
+                            move_after=True,
+                            is_dependency=True,
                         )
                 else:
-                    sys.stdout.write(
+                    self.write_warning(
                         f"\nWARNING: Cannot resolve the dependency marker '{name}' "
                         "- ignoring it."
                     )
@@ -319,10 +577,12 @@ class Sorter:
         # handle the rare case that several tests have the same alias name
         # we use the item that best matches the node id of the dependent item
         max_matching_parts = 0
-        node_id_parts = re.split("(::|/)", item.node_id)
+        node_id_parts = item.parts.names + (item.parts.parameters,)
         matching_item = aliases[0]
         for alias_item in aliases:
-            alias_node_id_parts = re.split("(::|/)", alias_item.node_id)
+            alias_node_id_parts = alias_item.parts.names + (
+                alias_item.parts.parameters,
+            )
             nr_matching_parts = 0
             for n, a in zip(node_id_parts, alias_node_id_parts):
                 if n != a:
@@ -334,66 +594,147 @@ class Sorter:
         return matching_item
 
 
-def module_item_groups(items: list[Item]) -> dict[str, list[Item]]:
+def has_ordering_markers(config: Config, items: list[Function]) -> bool:
     """
-    Split items into groups per module.
+    Return True if any of the items has a marker that may change the order:
+    an order or dependency marker, or a marker with the configured prefix.
+    Used to skip the sorting completely for sessions not using the plugin,
+    so only the keywords of the items are checked.
     """
-    module_items: OrderedDict[str, list[Item]] = OrderedDict()
+    marker_prefix = config.getoption("order_marker_prefix")
     for item in items:
-        module_items.setdefault(item.module_path, []).append(item)
-    return module_items
+        keywords = item.keywords
+        if "order" in keywords or "dependency" in keywords:
+            return True
+        if marker_prefix and any(key.startswith(marker_prefix) for key in keywords):
+            return True
+    return False
 
 
-def directory_item_groups(items: list[Item], level: int) -> dict[str, list[Item]]:
+def item_groups(items: Iterable[int], keys: Sequence[int]) -> dict[Hashable, list[int]]:
+    """
+    Split item indexes into groups with the same key.
+    Used with the module or class keys of an item index to split items into
+    groups per module or per class, where items outside a class are sorted
+    into a group per module.
     """
-    Split items into groups per directory at the given level.
+    groups: dict[Hashable, list[int]] = {}
+    for item in items:
+        groups.setdefault(keys[item], []).append(item)
+    return groups
+
+
+def directory_item_groups(items: list[Item], level: int) -> dict[Hashable, list[int]]:
+    """
+    Split item indexes into groups per directory at the given level.
     The level is relative to the root directory, which is at level 0.
     """
-    module_items: OrderedDict[str, list[Item]] = OrderedDict()
+    module_items: dict[Hashable, list[int]] = {}
     for item in items:
-        module_items.setdefault(item.parent_path(level), []).append(item)
+        module_items.setdefault(item.parts.path[:level], []).append(
+            item.collection_index
+        )
     return module_items
 
 
-def class_item_groups(items: list[Item]) -> dict[str, list[Item]]:
+def order_group_keys(settings: Settings, index: ItemIndex) -> list[Sequence[int]]:
     """
-    Split items into groups per class.
-    Items outside a class are sorted into a group per module.
+    Return the keys of the order groups inside an order scope, from the
+    outermost to the innermost group.
     """
-    class_items: OrderedDict[str, list[Item]] = OrderedDict()
-    for item in items:
-        delimiter_index = item.node_id.index("::")
-        if "::" in item.node_id[delimiter_index + 2 :]:
-            delimiter_index = item.node_id.index("::", delimiter_index + 2)
-        class_path = item.node_id[:delimiter_index]
-        class_items.setdefault(class_path, []).append(item)
-    return class_items
+    if settings.group_scope.value >= settings.scope.value:
+        return []
+    if settings.scope != Scope.SESSION:
+        return [index.class_keys]
+    if settings.group_scope == Scope.CLASS:
+        return [index.module_keys, index.class_keys]
+    return [index.module_keys]
+
+
+def is_grouped(items: list[int], group_keys: list[Sequence[int]]) -> bool:
+    """
+    Return if the items of each order group directly follow each other.
+    This is not the case for the items outside a class, if they are
+    collected before and after the class.
+    """
+    for keys in group_keys:
+        previous_key = None
+        seen_keys = set()
+        for item in items:
+            key = keys[item]
+            if key != previous_key:
+                if key in seen_keys:
+                    return False
+                seen_keys.add(key)
+                previous_key = key
+    return True
+
+
+def group_positions(groups: Iterable[list[int]]) -> dict[int, int]:
+    """Map each item index to the position of the group it belongs to."""
+    return {item: position for position, items in enumerate(groups) for item in items}
+
+
+def group_ordinal_ranks(
+    items: list[int], ranks: list[int], keys: Sequence[int]
+) -> dict[int, tuple[int, int]]:
+    """
+    Return the rank of the group ordinal and the position of the first item
+    for each group with the given keys.
+    The group ordinal is the smallest non-negative ordinal of the group
+    items, or the largest negative ordinal if there is none.
+    """
+    bounds: dict[int, list[int]] = {}
+    for position, item in enumerate(items):
+        rank = ranks[position]
+        bound = bounds.get(keys[item])
+        if bound is None:
+            bounds[keys[item]] = [position, rank, rank]
+        elif rank < bound[1]:
+            bound[1] = rank
+        elif rank > bound[2]:
+            bound[2] = rank
+    return {
+        key: (lowest if lowest < UNORDERED_RANK else highest, first)
+        for key, (first, lowest, highest) in bounds.items()
+    }
 
 
 class ScopeSorter:
     """
     Sorts the items for the defined scope.
+    Items are referenced by their index in the item index.
     """
 
     def __init__(
         self,
         settings: Settings,
-        items: list[Item],
-        rel_marks: list[RelativeMark[Item]],
-        dep_marks: list[RelativeMark[Item]],
-        session_scope: bool = False,
+        items: list[int],
+        constraints: ConstraintView,
+        index: ItemIndex,
     ) -> None:
         self.settings = settings
         self.items = items
-        # no need to filter items in session scope
-        if session_scope:
-            self.rel_marks = rel_marks
-            self.dep_marks = dep_marks
-        else:
-            self.rel_marks = filter_marks(rel_marks, self.items)
-            self.dep_marks = filter_marks(dep_marks, self.items)
-
-    def sort_items(self) -> list[Item]:
+        self.constraints = constraints
+        self.index = index
+        # the anchor items of the marks that could not be applied and
+        # the constraint cycles, for each sorted item list or group list
+        self.unhandled: list[tuple[list[int], list[list[int]]]] = []
+        # describes how the items have been sorted, shown in the statistics
+        self.strategy = ""
+
+    def sort_items(self) -> list[int]:
+        if not self.constraints and not self.settings.sparse_ordering:
+            self.strategy = "sorted by ordinals"
+            return self.sort_by_ordinals()
+        if (
+            not self.has_ordinals()
+            and is_grouped(self.items, self.group_keys())
+            and self.constraints.is_satisfied_by(self.items)
+        ):
+            self.strategy = "already in order"
+            return self.items
+        self.strategy = "sorted by relative markers"
         if self.settings.group_scope.value < self.settings.scope.value:
             if self.settings.scope == Scope.SESSION:
                 sorted_list = self.sort_in_session_scope()
@@ -404,9 +745,55 @@ class ScopeSorter:
 
         return sorted_list
 
-    def sort_in_session_scope(self) -> list[Item]:
+    def has_ordinals(self) -> bool:
+        orders = self.index.orders
+        return any(orders[item] != NO_ORDER for item in self.items)
+
+    def group_keys(self) -> list[Sequence[int]]:
+        """
+        Return the keys of the order groups inside the scope, from the
+        outermost to the innermost group.
+        """
+        return order_group_keys(self.settings, self.index)
+
+    def sort_by_ordinals(self) -> list[int]:
+        """
+        Sort the items of a scope without relative constraints using a single
+        stable sort. The order groups are sorted first by the rank of their
+        group ordinal and their position, each inside its enclosing group,
+        and the items are then sorted by the position of their group and the
+        rank of their ordinal. This gives the same result as sorting the
+        items inside each group before sorting the groups.
+        """
+        items = self.items
+        item_orders = list(map(self.index.orders.__getitem__, items))
+        order_ranks = {order: ordinal_rank(order) for order in set(item_orders)}
+        ranks = list(map(order_ranks.__getitem__, item_orders))
+        levels = self.group_keys()
+        if levels:
+            # the position of the enclosing group of each item
+            group_positions = [0] * len(items)
+            for keys in levels:
+                group_ranks = group_ordinal_ranks(items, ranks, keys)
+                sorted_groups = sorted(
+                    group_ranks,
+                    key=lambda key: (
+                        (group_positions[group_ranks[key][1]],) + group_ranks[key]
+                    ),
+                )
+                group_index = {key: pos for pos, key in enumerate(sorted_groups)}
+                group_positions = [group_index[keys[item]] for item in items]
+            # ranks are less than 2^64, so the group position can be
+            # combined with the rank into a single integer key
+            ranks = [
+                position << 64 | rank for position, rank in zip(group_positions, ranks)
+            ]
+        positions = sorted(range(len(items)), key=ranks.__getitem__)
+        return list(map(items.__getitem__, positions))
+
+    def sort_in_session_scope(self) -> list[int]:
         sorted_list = []
-        module_items = module_item_groups(self.items)
+        module_items = item_groups(self.items, self.index.module_keys)
         if self.settings.group_scope == Scope.CLASS:
             module_groups = self.sort_class_groups(module_items)
         else:
@@ -415,43 +802,68 @@ class ScopeSorter:
                 for item in module_items.values()
             ]
         sorter = GroupSorter(
-            Scope.MODULE, module_groups, self.rel_marks, self.dep_marks
+            Scope.MODULE,
+            module_groups,
+            group_positions(module_items.values()),
+            self.constraints,
+            self.settings.minimal_cycle_breaking,
         )
-        for group in sorter.sorted_groups()[1]:
+        for group in self.sorted_groups(sorter)[1]:
             sorted_list.extend(group.items)
         return sorted_list
 
-    def sort_in_module_scope(self) -> list[Item]:
+    def sort_in_module_scope(self) -> list[int]:
         sorted_list = []
-        class_items = class_item_groups(self.items)
+        class_items = item_groups(self.items, self.index.class_keys)
         class_groups = [
             self.sort_items_in_scope(item, Scope.CLASS) for item in class_items.values()
         ]
-        sorter = GroupSorter(Scope.CLASS, class_groups, self.rel_marks, self.dep_marks)
-        for group in sorter.sorted_groups()[1]:
+        sorter = GroupSorter(
+            Scope.CLASS,
+            class_groups,
+            group_positions(class_items.values()),
+            self.constraints,
+            self.settings.minimal_cycle_breaking,
+        )
+        for group in self.sorted_groups(sorter)[1]:
             sorted_list.extend(group.items)
         return sorted_list
 
-    def sort_class_groups(self, module_items: dict[str, list[Item]]) -> list[ItemGroup]:
+    def sort_class_groups(
+        self, module_items: dict[Hashable, list[int]]
+    ) -> list[ItemGroup]:
         module_groups = []
         for module_item in module_items.values():
-            class_items = class_item_groups(module_item)
+            class_items = item_groups(module_item, self.index.class_keys)
             class_groups = [
                 self.sort_items_in_scope(item, Scope.CLASS)
                 for item in class_items.values()
             ]
             module_group = ItemGroup()
             sorter = GroupSorter(
-                Scope.CLASS, class_groups, self.rel_marks, self.dep_marks
+                Scope.CLASS,
+                class_groups,
+                group_positions(class_items.values()),
+                self.constraints.subgraph(module_item),
+                self.settings.minimal_cycle_breaking,
             )
-            group_order, class_groups = sorter.sorted_groups()
+            group_order, class_groups = self.sorted_groups(sorter)
             module_group.extend(class_groups, group_order)
             module_groups.append(module_group)
         return module_groups
 
-    def sort_items_in_scope(self, items: list[Item], scope: Scope) -> ItemGroup:
+    def sorted_groups(
+        self, sorter: "GroupSorter"
+    ) -> tuple[Optional[int], list[ItemGroup]]:
+        group_order, groups = sorter.sorted_groups()
+        if sorter.unhandled_edges:
+            self.unhandled.append((sorter.unhandled_items(), sorter.cycles()))
+        return group_order, groups
+
+    def sort_items_in_scope(self, items: list[int], scope: Scope) -> ItemGroup:
+        """Sort the given items and return them as a group."""
         item_list = ItemList(
-            items, self.settings, scope, self.rel_marks, self.dep_marks
+            items, self.settings, scope, self.constraints, self.index.orders
         )
         for item in items:
             item_list.collect_markers(item)
@@ -459,7 +871,7 @@ class ScopeSorter:
         sorted_list = item_list.sort_numbered_items()
 
         if not item_list.apply_relative_constraints(sorted_list):
-            item_list.print_unhandled_items()
+            self.unhandled.append((item_list.unhandled_items(), item_list.cycles()))
         return ItemGroup(sorted_list, item_list.group_order())
 
 
@@ -471,90 +883,117 @@ def scope_from_name(name: str) -> Scope:
     return Scope.SESSION
 
 
-def scoped_node_id(node_id: str, scope: Scope) -> str:
-    if scope == Scope.MODULE:
-        return node_id[: node_id.index("::")]
-    if scope == Scope.CLASS:
-        return node_id[: node_id.rindex("::")]
-    return ""
-
-
 class GroupSorter:
     """
     Sorts groups of items.
+    The groups are referenced by their position in the given groups.
+    The marks between items of different groups are combined into a
+    constraint graph over the groups, which is sorted the same way as
+    the items inside a group.
     """
 
     def __init__(
         self,
         scope: Scope,
         groups: list[ItemGroup],
-        rel_marks: list[RelativeMark[Item]],
-        dep_marks: list[RelativeMark[Item]],
+        group_index: dict[int, int],
+        constraints: ConstraintView,
+        minimal_cycle_breaking: bool = False,
     ) -> None:
         self.scope: Scope = scope
         self.groups: list[ItemGroup] = groups
-        self.rel_marks: list[RelativeMark[ItemGroup]] = self.collect_group_marks(
-            rel_marks
-        )
-        self.dep_marks: list[RelativeMark[ItemGroup]] = self.collect_group_marks(
-            dep_marks
-        )
-
-    def collect_group_marks(
-        self, marks: list[RelativeMark[Item]]
-    ) -> list[RelativeMark[ItemGroup]]:
-        group_marks: list[RelativeMark[ItemGroup]] = []
-        for mark in marks:
-            group = self.group_for_item(mark.item)
-            group_to_move = self.group_for_item(mark.item_to_move)
-            if group is not None and group_to_move is not None:
-                group_marks.append(RelativeMark(group, group_to_move, mark.move_after))
-                group_to_move.inc_rel_marks()
-        return group_marks
-
-    def group_for_item(self, item: Item) -> Optional[ItemGroup]:
-        for group in self.groups:
-            if item in group.items:
-                return group
-        return None
+        self.minimal_cycle_breaking = minimal_cycle_breaking
+        # maps each item index to the position of its group
+        self.group_index = group_index
+        self.orders = array("q", (order_value(group.order) for group in groups))
+        self.positions: list[int] = list(range(len(groups)))
+        self.item_graph = constraints.graph
+        self.graph = ConstraintGraph(len(groups))
+        # the edges between items that define each group edge
+        self.item_edges: list[list[int]] = []
+        self.unhandled_edges: list[int] = []
+        self.collect_group_marks(constraints)
+        self.constraints = self.graph.subgraph(self.positions)
+
+    def collect_group_marks(self, constraints: ConstraintView) -> None:
+        """
+        Add the edges between the groups derived from the marks between
+        items of different groups. Marks inside a group have already been
+        handled while sorting the group.
+        """
+        graph = constraints.graph
+        group_edges: dict[tuple[int, int, int], int] = {}
+        for edge in constraints.edges():
+            group = self.group_index.get(graph.anchors[edge])
+            group_to_move = self.group_index.get(graph.targets[edge])
+            if group is None or group_to_move is None or group == group_to_move:
+                continue
+            flags = graph.flags[edge]
+            key = (group, group_to_move, flags & AFTER)
+            group_edge = group_edges.get(key)
+            if group_edge is None:
+                group_edge = group_edges[key] = len(self.graph)
+                self.graph.add_edge(
+                    group,
+                    group_to_move,
+                    move_after=bool(flags & AFTER),
+                    is_dependency=bool(flags & DEPENDENCY),
+                )
+                self.item_edges.append([])
+            self.item_edges[group_edge].append(edge)
 
     def sorted_groups(self) -> tuple[Optional[int], list[ItemGroup]]:
         group_order = self.sort_by_ordinal_markers()
-        length = len(self.rel_marks) + len(self.dep_marks)
-        if length == 0:
-            return group_order, self.groups
-
-        # handle relative markers the same way single items are handled
-        still_left = 0
-        while length and still_left != length:
-            still_left = length
-            self.handle_rel_marks(self.rel_marks)
-            self.handle_rel_marks(self.dep_marks)
-        return group_order, self.groups
+        if self.constraints:
+            self.positions, self.unhandled_edges = self.constraints.sort(
+                self.positions, self.orders, self.minimal_cycle_breaking
+            )
+        return group_order, [self.groups[i] for i in self.positions]
+
+    def unhandled_items(self) -> list[int]:
+        """
+        Return the items of the marks between groups that could not be
+        applied, chosen the same way as in ItemList.unhandled_items.
+        """
+        items = (
+            self.item_graph.targets
+            if self.minimal_cycle_breaking
+            else self.item_graph.anchors
+        )
+        return [
+            items[item_edge]
+            for edge in self.unhandled_edges
+            for item_edge in self.item_edges[edge]
+        ]
+
+    def cycles(self) -> list[list[int]]:
+        """
+        Return the constraint cycles between the groups, each as a list
+        of edges between items that connect the groups along the cycle.
+        """
+        return [
+            [self.item_edges[edge][0] for edge in cycle]
+            for cycle in self.constraints.cycles()
+        ]
 
     def sort_by_ordinal_markers(self) -> Optional[int]:
         start_groups = []
         middle_groups = []
         end_groups = []
-        for group in self.groups:
-            if group.order is None:
-                middle_groups.append(group)
-            elif group.order >= 0:
-                start_groups.append(group)
+        for position, order in enumerate(self.orders):
+            if order == NO_ORDER:
+                middle_groups.append(position)
+            elif order >= 0:
+                start_groups.append(position)
             else:
-                end_groups.append(group)
-        start_groups = sorted(start_groups, key=lambda g: cast(int, g.order))
-        end_groups = sorted(end_groups, key=lambda g: cast(int, g.order))
-        self.groups = start_groups + middle_groups + end_groups
+                end_groups.append(position)
+        start_groups.sort(key=self.orders.__getitem__)
+        end_groups.sort(key=self.orders.__getitem__)
+        self.positions = start_groups + middle_groups + end_groups
         if start_groups:
-            group_order = start_groups[0].order
+            group_order = self.groups[start_groups[0]].order
         elif end_groups:
-            group_order = end_groups[-1].order
+            group_order = self.groups[end_groups[-1]].order
         else:
             group_order = None
         return group_order
-
-    def handle_rel_marks(self, marks: list[RelativeMark[ItemGroup]]) -> None:
-        for mark in reversed(marks):
-            if move_item(mark, self.groups):
-                marks.remove(mark)
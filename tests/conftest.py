@@ -39,6 +39,10 @@ def ignore_settings(mocker):
     settings.return_value.group_scope = Scope.SESSION
     settings.return_value.scope_level = 0
     settings.return_value.marker_prefix = None
+    settings.return_value.minimal_cycle_breaking = False
+    settings.return_value.order_stats = False
+    settings.return_value.order_workers = 1
+    settings.return_value.order_by_duration = None
     yield settings
 
 
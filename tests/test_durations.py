@@ -0,0 +1,163 @@
+import pytest
+
+from pytest_order.durations import Duration, DurationHistory
+from pytest_order.plugin import item_path
+
+
+@pytest.fixture
+def history_path(tmpdir):
+    yield str(tmpdir.join("durations.bin"))
+
+
+def test_weighted_duration(history_path):
+    history = DurationHistory(history_path)
+    assert history.get("test_a.py::test_a") is None
+    history.add("test_a.py::test_a", 1.0)
+    assert history.get("test_a.py::test_a") == Duration(1.0, 0.0, 1)
+    history.add("test_a.py::test_a", 2.0)
+    duration = history.get("test_a.py::test_a")
+    assert duration is not None
+    assert duration.mean == pytest.approx(1.3)
+    assert duration.variance == pytest.approx(0.21)
+    assert duration.runs == 2
+
+
+def test_save_and_load(history_path):
+    history = DurationHistory(history_path)
+    history.add("test_a.py::test_a", 1.5)
+    history.add("test_a.py::test_b[ä]", 0.25)
+    history.add("test_a.py::test_b[ä]", 0.25)
+    history.save()
+    history = DurationHistory(history_path)
+    assert len(history) == 2
+    assert history.get("test_a.py::test_a") == Duration(1.5, 0.0, 1)
+    assert history.get("test_a.py::test_b[ä]") == Duration(0.25, 0.0, 2)
+
+
+def test_invalid_file(history_path):
+    with open(history_path, "wb") as history:
+        history.write(b"PTOD\x01\x00")
+    assert len(DurationHistory(history_path)) == 0
+
+
+def test_prune(history_path):
+    history = DurationHistory(history_path)
+    for name in "abc":
+        history.add(f"test_{name}.py::test_{name}", 1.0)
+    history.prune(lambda node_id: not node_id.startswith("test_b"))
+    assert len(history) == 2
+    assert history.get("test_b.py::test_b") is None
+    assert history.get("test_c.py::test_c") == Duration(1.0, 0.0, 1)
+
+
+def test_record_durations(test_path):
+    test_path.makepyfile(
+        test_durations=(
+            """
+            import pytest
+
+            def test_a():
+                assert True
+
+            @pytest.mark.skip
+            def test_b():
+                assert True
+            """
+        )
+    )
+    test_path.makepyfile(test_removed="def test_c(): pass")
+    test_path.runpytest("--order-durations").assert_outcomes(passed=2, skipped=1)
+    test_path.tmpdir.join("test_removed.py").remove()
+    result = test_path.runpytest("--order-durations")
+    result.assert_outcomes(passed=1, skipped=1)
+    history = DurationHistory(
+        str(
+            test_path.tmpdir.join(".pytest_cache", "d", "pytest-order", "durations.bin")
+        )
+    )
+    assert history.node_ids == ["test_durations.py::test_a"]
+    duration = history.get("test_durations.py::test_a")
+    assert duration is not None
+    assert duration.runs == 2
+
+
+def test_history_in_cache(test_path):
+    history = DurationHistory.for_config(test_path.parseconfigure())
+    assert history is not None
+    assert history.path == str(
+        test_path.tmpdir.join(".pytest_cache", "d", "pytest-order", "durations.bin")
+    )
+
+
+def test_item_path(test_path):
+    test_path.makepyfile(test_durations="def test_a(): pass")
+    items, _ = test_path.inline_genitems()
+    assert item_path(items[0]) == str(test_path.tmpdir.join("test_durations.py"))
+
+
+def test_durations_not_recorded_by_default(test_path):
+    test_path.makepyfile(test_durations="def test_a(): pass")
+    test_path.runpytest().assert_outcomes(passed=1)
+    assert not test_path.tmpdir.join(".pytest_cache", "d", "pytest-order").exists()
+
+
+def test_durations_without_cache(test_path):
+    test_path.makepyfile(test_durations="def test_a(): pass")
+    result = test_path.runpytest("--order-durations", "-p", "no:cacheprovider")
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(
+        [
+            "*PytestConfigWarning: The durations of the tests cannot be recorded "
+            "without the cacheprovider plugin."
+        ]
+    )
+    assert not test_path.tmpdir.join(".pytest_cache").exists()
+
+
+def test_removed_tests_are_pruned(test_path):
+    test_path.makepyfile(
+        test_durations="def test_a(): pass\ndef test_b(): pass\ndef test_c(): pass",
+        test_other="def test_d(): pass",
+    )
+    test_path.runpytest("--order-durations").assert_outcomes(passed=4)
+    test_path.makepyfile(test_durations="def test_a(): pass\ndef test_c(): pass")
+    # the tests of the other file are kept, as it is not collected,
+    # and deselected tests are kept as they still exist
+    result = test_path.runpytest(
+        "--order-durations", "test_durations.py", "-k", "test_a"
+    )
+    result.assert_outcomes(passed=1)
+    # tests in a file from which only single tests are collected are kept
+    test_path.makepyfile(test_other="def test_e(): pass")
+    result = test_path.runpytest("--order-durations", "test_other.py::test_e")
+    result.assert_outcomes(passed=1)
+    history = DurationHistory(
+        str(
+            test_path.tmpdir.join(".pytest_cache", "d", "pytest-order", "durations.bin")
+        )
+    )
+    assert history.node_ids == [
+        "test_durations.py::test_a",
+        "test_durations.py::test_c",
+        "test_other.py::test_d",
+        "test_other.py::test_e",
+    ]
+
+
+def test_last_failed_tests_are_not_pruned(test_path):
+    test_path.makepyfile(
+        test_durations="def test_pass(): pass\ndef test_fail(): assert False"
+    )
+    test_path.runpytest("--order-durations").assert_outcomes(passed=1, failed=1)
+    # the passed test is not collected, but still exists
+    result = test_path.runpytest("--order-durations", "--lf")
+    result.assert_outcomes(failed=1)
+    history = DurationHistory(
+        str(
+            test_path.tmpdir.join(".pytest_cache", "d", "pytest-order", "durations.bin")
+        )
+    )
+    assert history.node_ids == [
+        "test_durations.py::test_pass",
+        "test_durations.py::test_fail",
+    ]
@@ -48,3 +48,78 @@ def tests_working_without_dependency(test_path):
             "test_a.py::test_a PASSED",
         ]
     )
+
+
+def test_no_sorting_without_markers(item_names_for, mocker):
+    sorter = mocker.patch("pytest_order.plugin.Sorter")
+    tests_content = """
+        import pytest
+
+        def test_b(): pass
+
+        @pytest.mark.skip
+        def test_a(): pass
+        """
+    assert item_names_for(tests_content) == ["test_b", "test_a"]
+    sorter.assert_not_called()
+
+
+def test_sorting_with_marker_prefix_only(test_path):
+    test_path.makepyfile(
+        test_a=(
+            """
+            import pytest
+
+            def test_a(): pass
+
+            @pytest.mark.my0
+            def test_b(): pass
+            """
+        )
+    )
+    result = test_path.runpytest("-v", "--order-marker-prefix=my")
+    result.stdout.fnmatch_lines(
+        [
+            "test_a.py::test_b PASSED",
+            "test_a.py::test_a PASSED",
+        ]
+    )
+
+
+def test_sorting_into_order_groups_without_markers(test_path):
+    test_path.makepyfile(
+        test_a=(
+            """
+            def test_0(): pass
+
+            class TestC:
+                def test_1(self): pass
+
+            def test_2(): pass
+            """
+        )
+    )
+    result = test_path.runpytest(
+        "-v", "--order-group-scope=class", "--order-scope=module"
+    )
+    result.stdout.fnmatch_lines(
+        [
+            "test_a.py::test_0 PASSED",
+            "test_a.py::test_2 PASSED",
+            "test_a.py::TestC::test_1 PASSED",
+        ]
+    )
+
+
+def test_invalid_scopes_without_markers(test_path):
+    test_path.makepyfile(test_a="def test_a(): pass")
+    result = test_path.runpytest(
+        "-v", "--order-scope=function", "--order-group-scope=function"
+    )
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(
+        [
+            "*UserWarning: Unknown order scope 'function', ignoring it.*",
+            "*UserWarning: Unknown order group scope 'function', ignoring it.*",
+        ]
+    )
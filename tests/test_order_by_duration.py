@@ -0,0 +1,214 @@
+import pytest
+
+from pytest_order.durations import DurationHistory
+
+
+@pytest.fixture
+def durations(test_path):
+    def _durations(**durations):
+        test_path.tmpdir.join(".pytest_cache", "d", "pytest-order").ensure(dir=True)
+        history = DurationHistory(
+            str(
+                test_path.tmpdir.join(
+                    ".pytest_cache", "d", "pytest-order", "durations.bin"
+                )
+            )
+        )
+        for name, duration in durations.items():
+            module, _, test = name.partition("__")
+            history.add(f"{module}.py::{test}", duration)
+        history.save()
+
+    yield _durations
+
+
+def test_longest_first(test_path, durations):
+    test_path.makepyfile(
+        test_durations=(
+            """
+            import pytest
+
+            def test_a():
+                assert True
+
+            @pytest.mark.order(0)
+            def test_b():
+                assert True
+
+            def test_c():
+                assert True
+
+            def test_d():
+                assert True
+
+            @pytest.mark.order(after="test_d")
+            def test_e():
+                assert True
+
+            def test_f():
+                assert True
+
+            def test_g():
+                assert True
+            """
+        )
+    )
+    durations(
+        test_durations__test_a=0.5,
+        test_durations__test_b=3.0,
+        test_durations__test_c=1.0,
+        test_durations__test_d=5.0,
+        test_durations__test_f=2.0,
+    )
+    result = test_path.runpytest("-v", "--order-by-duration=longest-first")
+    result.assert_outcomes(passed=7, failed=0)
+    result.stdout.fnmatch_lines(
+        [
+            "test_durations.py::test_b PASSED",
+            "test_durations.py::test_f PASSED",
+            "test_durations.py::test_c PASSED",
+            "test_durations.py::test_d PASSED",
+            "test_durations.py::test_e PASSED",
+            "test_durations.py::test_a PASSED",
+            "test_durations.py::test_g PASSED",
+        ]
+    )
+
+
+def test_longest_first_in_module_scope(test_path, durations):
+    test_path.makepyfile(
+        test_module1=(
+            """
+            def test_a():
+                assert True
+
+            def test_b():
+                assert True
+            """
+        ),
+        test_module2=(
+            """
+            def test_a():
+                assert True
+
+            def test_b():
+                assert True
+            """
+        ),
+    )
+    durations(
+        test_module1__test_a=1.0,
+        test_module1__test_b=2.0,
+        test_module2__test_a=0.5,
+        test_module2__test_b=3.0,
+    )
+    result = test_path.runpytest(
+        "-v", "--order-by-duration=longest-first", "--order-scope=module"
+    )
+    result.assert_outcomes(passed=4, failed=0)
+    result.stdout.fnmatch_lines(
+        [
+            "test_module1.py::test_b PASSED",
+            "test_module1.py::test_a PASSED",
+            "test_module2.py::test_b PASSED",
+            "test_module2.py::test_a PASSED",
+        ]
+    )
+
+
+def test_longest_first_with_group_scope(test_path, durations):
+    test_path.makepyfile(
+        test_module1=(
+            """
+            def test_a():
+                assert True
+            """
+        ),
+        test_module2=(
+            """
+            import pytest
+
+            def test_a():
+                assert True
+
+            @pytest.mark.order(0)
+            def test_b():
+                assert True
+
+            def test_c():
+                assert True
+            """
+        ),
+    )
+    durations(
+        test_module1__test_a=5.0,
+        test_module2__test_a=0.5,
+        test_module2__test_c=3.0,
+    )
+    result = test_path.runpytest(
+        "-v", "--order-by-duration=longest-first", "--order-group-scope=module"
+    )
+    result.assert_outcomes(passed=4, failed=0)
+    result.stdout.fnmatch_lines(
+        [
+            "test_module2.py::test_b PASSED",
+            "test_module2.py::test_c PASSED",
+            "test_module2.py::test_a PASSED",
+            "test_module1.py::test_a PASSED",
+        ]
+    )
+
+
+def test_durations_recorded(test_path):
+    test_path.makepyfile(
+        test_durations=(
+            """
+            def test_a():
+                assert True
+            """
+        )
+    )
+    result = test_path.runpytest("--order-by-duration=longest-first")
+    result.assert_outcomes(passed=1, failed=0)
+    history = DurationHistory(
+        str(
+            test_path.tmpdir.join(".pytest_cache", "d", "pytest-order", "durations.bin")
+        )
+    )
+    duration = history.get("test_durations.py::test_a")
+    assert duration is not None
+    assert duration.runs == 1
+
+
+def test_longest_first_without_cache(test_path, durations):
+    test_path.makepyfile(
+        test_durations=(
+            """
+            import pytest
+
+            def test_a():
+                assert True
+
+            @pytest.mark.order(0)
+            def test_b():
+                assert True
+
+            def test_c():
+                assert True
+            """
+        )
+    )
+    durations(test_durations__test_a=0.5, test_durations__test_c=1.0)
+    result = test_path.runpytest(
+        "-v", "--order-by-duration=longest-first", "-p", "no:cacheprovider"
+    )
+    result.assert_outcomes(passed=3)
+    result.stdout.fnmatch_lines(
+        [
+            "test_durations.py::test_b PASSED",
+            "test_durations.py::test_a PASSED",
+            "test_durations.py::test_c PASSED",
+            "*PytestConfigWarning: The tests cannot be ordered by duration without "
+            "the cacheprovider plugin, keeping the collection order.",
+        ]
+    )
@@ -0,0 +1,199 @@
+import json
+
+import pytest
+
+from pytest_order.sorter import Sorter
+
+
+@pytest.fixture
+def fixture_path(test_path):
+    test_path.makepyfile(
+        test_cache=(
+            """
+            import pytest
+
+            @pytest.mark.order(after="test_b")
+            def test_a():
+                assert True
+
+            def test_b():
+                assert True
+
+            @pytest.mark.order(0)
+            def test_c():
+                assert True
+            """
+        )
+    )
+    yield test_path
+
+
+def test_cached_order_is_reused(fixture_path, mocker):
+    result = fixture_path.runpytest("-v", "--order-cache")
+    result.assert_outcomes(passed=3, failed=0)
+    sorter = mocker.patch("pytest_order.plugin.Sorter", wraps=Sorter)
+    result = fixture_path.runpytest("-v", "--order-cache", "--order-stats")
+    result.assert_outcomes(passed=3, failed=0)
+    result.stdout.fnmatch_lines(
+        [
+            "pytest-order: 3 tests in cached order.",
+            "test_cache.py::test_c PASSED",
+            "test_cache.py::test_b PASSED",
+            "test_cache.py::test_a PASSED",
+        ]
+    )
+    sorter.assert_not_called()
+
+
+def test_changed_markers_invalidate_cache(fixture_path, mocker):
+    result = fixture_path.runpytest("-v", "--order-cache")
+    result.assert_outcomes(passed=3, failed=0)
+    fixture_path.makepyfile(
+        test_cache=(
+            """
+            import pytest
+
+            @pytest.mark.order(before="test_b")
+            def test_a():
+                assert True
+
+            def test_b():
+                assert True
+
+            @pytest.mark.order(0)
+            def test_c():
+                assert True
+            """
+        )
+    )
+    sorter = mocker.patch("pytest_order.plugin.Sorter", wraps=Sorter)
+    result = fixture_path.runpytest("-v", "--order-cache")
+    result.assert_outcomes(passed=3, failed=0)
+    result.stdout.fnmatch_lines(
+        [
+            "test_cache.py::test_c PASSED",
+            "test_cache.py::test_a PASSED",
+            "test_cache.py::test_b PASSED",
+        ]
+    )
+    sorter.assert_called_once()
+
+
+def test_changed_options_invalidate_cache(fixture_path, mocker):
+    result = fixture_path.runpytest("-v", "--order-cache")
+    result.assert_outcomes(passed=3, failed=0)
+    sorter = mocker.patch("pytest_order.plugin.Sorter", wraps=Sorter)
+    result = fixture_path.runpytest("-v", "--order-cache", "--order-scope=module")
+    result.assert_outcomes(passed=3, failed=0)
+    sorter.assert_called_once()
+
+
+def test_order_with_warnings_is_not_cached(test_path, mocker):
+    test_path.makepyfile(
+        test_cache=(
+            """
+            import pytest
+
+            @pytest.mark.order(after="test_unknown")
+            def test_a():
+                assert True
+
+            def test_b():
+                assert True
+            """
+        )
+    )
+    result = test_path.runpytest("-v", "--order-cache")
+    result.assert_outcomes(passed=2, failed=0)
+    sorter = mocker.patch("pytest_order.plugin.Sorter", wraps=Sorter)
+    result = test_path.runpytest("-v", "--order-cache")
+    result.assert_outcomes(passed=2, failed=0)
+    result.stdout.fnmatch_lines(
+        [
+            "*WARNING: cannot execute 'test_a' relative to others: "
+            "'test_unknown' - ignoring the marker.*"
+        ]
+    )
+    sorter.assert_called_once()
+
+
+def test_unchanged_scope_groups_are_reused(test_path):
+    module1 = """
+        import pytest
+
+        @pytest.mark.order(after="test_b")
+        def test_a():
+            assert True
+
+        def test_b():
+            assert True
+        """
+    test_path.makepyfile(test_module1=module1, test_module2=module1)
+    result = test_path.runpytest(
+        "-v", "--order-cache", "--order-stats", "--order-scope=module"
+    )
+    result.assert_outcomes(passed=4, failed=0)
+    result.stdout.fnmatch_lines(
+        ["pytest-order: 4 tests in 2 scope groups: 2 sorted by relative markers."]
+    )
+    test_path.makepyfile(
+        test_module2=(
+            """
+            import pytest
+
+            def test_a():
+                assert True
+
+            @pytest.mark.order(before="test_a")
+            def test_b():
+                assert True
+            """
+        )
+    )
+    result = test_path.runpytest(
+        "-v", "--order-cache", "--order-stats", "--order-scope=module"
+    )
+    result.assert_outcomes(passed=4, failed=0)
+    result.stdout.fnmatch_lines(
+        [
+            "pytest-order: 4 tests in 2 scope groups: 1 cached, "
+            "1 sorted by relative markers.",
+            "test_module1.py::test_b PASSED",
+            "test_module1.py::test_a PASSED",
+            "test_module2.py::test_b PASSED",
+            "test_module2.py::test_a PASSED",
+        ]
+    )
+
+
+def test_invalid_options_are_reported_with_cached_order(fixture_path, mocker):
+    result = fixture_path.runpytest("-v", "--order-cache", "--order-scope=function")
+    result.assert_outcomes(passed=3, failed=0)
+    sorter = mocker.patch("pytest_order.plugin.Sorter", wraps=Sorter)
+    result = fixture_path.runpytest("-v", "--order-cache", "--order-scope=function")
+    result.assert_outcomes(passed=3, failed=0)
+    result.stdout.fnmatch_lines(
+        ["*UserWarning: Unknown order scope 'function', ignoring it.*"]
+    )
+    sorter.assert_not_called()
+
+
+@pytest.mark.parametrize("order", [[0, 0, 1], [0, 1, 3], [0, 1, "2"]])
+def test_invalid_cached_order_is_ignored(fixture_path, mocker, order):
+    result = fixture_path.runpytest("-v", "--order-cache")
+    result.assert_outcomes(passed=3, failed=0)
+    cache_file = fixture_path.tmpdir.join(".pytest_cache", "v", "pytest-order", "plan")
+    plan = json.loads(cache_file.read())
+    plan["order"] = order
+    cache_file.write(json.dumps(plan))
+    sorter = mocker.patch("pytest_order.plugin.Sorter", wraps=Sorter)
+    result = fixture_path.runpytest("-v", "--order-cache")
+    result.assert_outcomes(passed=3, failed=0)
+    result.stdout.fnmatch_lines(
+        [
+            "test_cache.py::test_c PASSED",
+            "test_cache.py::test_b PASSED",
+            "test_cache.py::test_a PASSED",
+        ]
+    )
+    sorter.assert_called_once()
@@ -177,6 +177,44 @@ def test_class_group_scope_module_scope(fixture_path):
     )
 
 
+def test_class_group_scope_unmarked_module(test_path):
+    test_path.makepyfile(
+        test_classes=(
+            """
+            def test_0(): pass
+
+            class TestC:
+                def test_1(self): pass
+
+            def test_2(): pass
+            """
+        ),
+        test_other=(
+            """
+            import pytest
+
+            def test_a(): pass
+
+            @pytest.mark.order(0)
+            def test_b(): pass
+            """
+        ),
+    )
+    result = test_path.runpytest(
+        "-v", "--order-group-scope=class", "--order-scope=module"
+    )
+    result.assert_outcomes(passed=5, failed=0)
+    result.stdout.fnmatch_lines(
+        [
+            "test_classes.py::test_0 PASSED",
+            "test_classes.py::test_2 PASSED",
+            "test_classes.py::TestC::test_1 PASSED",
+            "test_other.py::test_b PASSED",
+            "test_other.py::test_a PASSED",
+        ]
+    )
+
+
 @pytest.mark.skipif(
     pytest.__version__.startswith("3.7."),
     reason="Warning does not appear in output in pytest < 3.8",
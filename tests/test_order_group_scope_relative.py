@@ -170,3 +170,124 @@ def test_rel_class_mark_with_order_mark(test_path):
             "test_class_rel.py::Test1::test_1 PASSED",
         ]
     )
+
+
+def test_satisfied_marks_around_class(test_path):
+    test_path.makepyfile(
+        test_classes="""
+        import pytest
+
+        def test_0(): pass
+
+        class TestC:
+            @pytest.mark.order(after="test_0")
+            def test_1(self): pass
+
+        def test_2(): pass
+        """
+    )
+    result = test_path.runpytest(
+        "-v", "--order-group-scope=class", "--order-scope=module"
+    )
+    result.assert_outcomes(passed=3, failed=0)
+    result.stdout.fnmatch_lines(
+        [
+            "test_classes.py::test_0 PASSED",
+            "test_classes.py::test_2 PASSED",
+            "test_classes.py::TestC::test_1 PASSED",
+        ]
+    )
+
+
+def test_transitive_module_group_marks(test_path):
+    test_path.makepyfile(
+        test_rel1=(
+            """
+            def test_one():
+                assert True
+
+            def test_two():
+                assert True
+            """
+        ),
+        test_rel2=(
+            """
+            import pytest
+
+            @pytest.mark.order(before="test_rel1.py::test_one")
+            def test_one():
+                assert True
+
+            def test_two():
+                assert True
+            """
+        ),
+        test_rel3=(
+            """
+            import pytest
+
+            @pytest.mark.order(before="test_rel2.py::test_one")
+            def test_one():
+                assert True
+
+            def test_two():
+                assert True
+            """
+        ),
+    )
+    result = test_path.runpytest("-v", "--order-group-scope=module")
+    result.assert_outcomes(passed=6, failed=0)
+    result.stdout.fnmatch_lines(
+        [
+            "test_rel3.py::test_one PASSED",
+            "test_rel3.py::test_two PASSED",
+            "test_rel2.py::test_one PASSED",
+            "test_rel2.py::test_two PASSED",
+            "test_rel1.py::test_one PASSED",
+            "test_rel1.py::test_two PASSED",
+        ]
+    )
+
+
+def test_module_group_cycle(test_path):
+    test_path.makepyfile(
+        test_rel1=(
+            """
+            import pytest
+
+            @pytest.mark.order(after="test_rel2.py::test_one")
+            def test_one():
+                assert True
+
+            def test_two():
+                assert True
+            """
+        ),
+        test_rel2=(
+            """
+            import pytest
+
+            def test_one():
+                assert True
+
+            @pytest.mark.order(after="test_rel1.py::test_two")
+            def test_two():
+                assert True
+            """
+        ),
+    )
+    result = test_path.runpytest("-v", "--order-group-scope=module")
+    result.assert_outcomes(passed=4, failed=0)
+    result.stdout.fnmatch_lines(
+        [
+            "WARNING: cannot execute test relative to others: "
+            "test_rel2.py::test_one test_rel1.py::test_two.",
+            "WARNING: constraint cycle: test_rel2.py::test_one -[after]-> "
+            "test_rel1.py::test_one ~ test_rel1.py::test_two -[after]-> "
+            "test_rel2.py::test_two ~ test_rel2.py::test_one",
+            "test_rel1.py::test_one PASSED",
+            "test_rel1.py::test_two PASSED",
+            "test_rel2.py::test_one PASSED",
+            "test_rel2.py::test_two PASSED",
+        ]
+    )
@@ -0,0 +1,223 @@
+import pytest
+
+from pytest_order.plan import SharedOrder, SharedPlan
+from pytest_order.plugin import sort_items
+from pytest_order.sorter import Sorter
+
+
+@pytest.fixture
+def fixture_path(test_path):
+    test_path.makepyfile(
+        test_plan=(
+            """
+            import pytest
+
+            @pytest.mark.order(after="test_b")
+            def test_a():
+                assert True
+
+            def test_b():
+                assert True
+
+            @pytest.mark.order(0)
+            def test_c():
+                assert True
+            """
+        )
+    )
+    yield test_path
+
+
+def test_export_plan(fixture_path):
+    plan_path = fixture_path.tmpdir.join("order.plan")
+    result = fixture_path.runpytest("-v", f"--order-export={plan_path}")
+    result.assert_outcomes(passed=3, failed=0)
+    lines = plan_path.read().splitlines()
+    assert lines[0].startswith("# pytest-order plan ")
+    assert lines[1:] == [
+        "test_plan.py::test_c",
+        "test_plan.py::test_b",
+        "test_plan.py::test_a\t1",
+    ]
+
+
+def test_apply_plan(fixture_path, mocker):
+    plan_path = fixture_path.tmpdir.join("order.plan")
+    result = fixture_path.runpytest("-v", f"--order-export={plan_path}")
+    result.assert_outcomes(passed=3, failed=0)
+    sorter = mocker.patch("pytest_order.plugin.Sorter", wraps=Sorter)
+    result = fixture_path.runpytest(
+        "-v", f"--order-plan={plan_path}", "-k", "test_a or test_c"
+    )
+    result.assert_outcomes(passed=2, failed=0)
+    result.stdout.fnmatch_lines(
+        [
+            "test_plan.py::test_c PASSED",
+            "test_plan.py::test_a PASSED",
+        ]
+    )
+    sorter.assert_not_called()
+
+
+def test_plan_with_failed_ordering(test_path, mocker):
+    test_path.makepyfile(
+        test_plan=(
+            """
+            import pytest
+
+            @pytest.mark.order(after="test_b")
+            def test_a():
+                assert True
+
+            @pytest.mark.order(after="test_a")
+            def test_b():
+                assert True
+
+            def test_c():
+                assert True
+            """
+        )
+    )
+    plan_path = test_path.tmpdir.join("order.plan")
+    result = test_path.runpytest(
+        "-v", "--error-on-failed-ordering", f"--order-export={plan_path}"
+    )
+    result.assert_outcomes(passed=1, errors=2)
+    sorter = mocker.patch("pytest_order.plugin.Sorter", wraps=Sorter)
+    result = test_path.runpytest(
+        "-v", "--error-on-failed-ordering", f"--order-plan={plan_path}"
+    )
+    result.assert_outcomes(passed=1, errors=2)
+    result.stdout.fnmatch_lines(
+        [
+            "*WARNING: cannot execute test relative to others: "
+            "test_plan.py::test_b test_plan.py::test_a - ignoring the marker.",
+            "WARNING: constraint cycle: *",
+            "test_plan.py::test_a ERROR",
+            "test_plan.py::test_b ERROR",
+            "test_plan.py::test_c PASSED",
+        ]
+    )
+    sorter.assert_not_called()
+
+
+def test_plan_with_missing_tests(fixture_path, mocker):
+    plan_path = fixture_path.tmpdir.join("order.plan")
+    result = fixture_path.runpytest("-v", f"--order-export={plan_path}")
+    result.assert_outcomes(passed=3, failed=0)
+    fixture_path.makepyfile(
+        test_other=(
+            """
+            def test_d():
+                assert True
+            """
+        )
+    )
+    sorter = mocker.patch("pytest_order.plugin.Sorter", wraps=Sorter)
+    result = fixture_path.runpytest("-v", f"--order-plan={plan_path}")
+    result.assert_outcomes(passed=4, failed=0)
+    result.stdout.fnmatch_lines(
+        [
+            "*WARNING: tests missing in the order plan: "
+            "test_other.py::test_d - ignoring the plan.*",
+            "test_plan.py::test_c PASSED",
+            "test_other.py::test_d PASSED",
+            "test_plan.py::test_b PASSED",
+            "test_plan.py::test_a PASSED",
+        ]
+    )
+    sorter.assert_called_once()
+
+
+def test_plan_with_other_options(fixture_path):
+    plan_path = fixture_path.tmpdir.join("order.plan")
+    result = fixture_path.runpytest("-v", f"--order-export={plan_path}")
+    result.assert_outcomes(passed=3, failed=0)
+    result = fixture_path.runpytest(
+        "-v", f"--order-plan={plan_path}", "--order-scope=module"
+    )
+    result.assert_outcomes(passed=3, failed=0)
+    result.stdout.fnmatch_lines(
+        [
+            "*WARNING: the order plan has been created with other ordering "
+            "options - ignoring it.*"
+        ]
+    )
+
+
+def test_invalid_plan(fixture_path):
+    plan_path = fixture_path.tmpdir.join("order.plan")
+    plan_path.write("test_plan.py::test_a\n")
+    result = fixture_path.runpytest("-v", f"--order-plan={plan_path}")
+    result.stderr.fnmatch_lines(["*pytest-order: '*order.plan' is not an order plan"])
+
+
+def shared_plan_items(fixture_path):
+    items, _ = fixture_path.inline_genitems()
+    config = items[0].config
+    config.workerinput = {
+        "workerid": "gw0",
+        "order_plan_dir": str(fixture_path.tmpdir),
+    }
+    return config, items
+
+
+def worker_plan(config, items):
+    plan = SharedPlan.for_worker(config, items)
+    assert plan is not None
+    return plan
+
+
+def test_shared_plan(fixture_path):
+    config, items = shared_plan_items(fixture_path)
+    leader = worker_plan(config, items)
+    assert leader.is_leader
+    order = SharedOrder([2, 1, 0], ["\nWARNING: some warning"], ["warning"], [1])
+    leader.publish(order)
+    worker = worker_plan(config, items)
+    assert not worker.is_leader
+    assert worker.wait() == order
+
+
+def test_shared_plan_for_other_items(fixture_path):
+    config, items = shared_plan_items(fixture_path)
+    worker_plan(config, items).publish(SharedOrder([2, 1, 0], [], [], []))
+    worker = worker_plan(config, items[:2])
+    assert worker.wait() is None
+
+
+def test_shared_plan_without_order(fixture_path):
+    config, items = shared_plan_items(fixture_path)
+    worker_plan(config, items).publish(None)
+    assert worker_plan(config, items).wait() is None
+
+
+def test_missing_shared_plan(fixture_path):
+    config, items = shared_plan_items(fixture_path)
+    assert worker_plan(config, items).wait(timeout=0) is None
+    del config.workerinput
+    assert SharedPlan.for_worker(config, items) is None
+
+
+def test_shared_order_is_applied(fixture_path, mocker):
+    config, items = shared_plan_items(fixture_path)
+    worker_plan(config, items).publish(
+        SharedOrder([1, 0, 2], ["\nWARNING: some warning"], ["warning"], [2])
+    )
+    sorter = mocker.patch("pytest_order.plugin.Sorter", wraps=Sorter)
+    with pytest.warns(UserWarning, match="warning"):
+        sort_items(config, items)
+    sorter.assert_not_called()
+    assert [item.name for item in items] == ["test_b", "test_a", "test_c"]
+    assert items[2].fixturenames[0] == "fail_after_cannot_order"
+
+
+def test_items_are_sorted_without_shared_order(fixture_path, mocker):
+    config, items = shared_plan_items(fixture_path)
+    # another worker has started sorting, but never publishes the order
+    assert worker_plan(config, items).is_leader
+    mocker.patch("pytest_order.plan.SHARED_PLAN_TIMEOUT", 0)
+    sorter = mocker.patch("pytest_order.plugin.Sorter", wraps=Sorter)
+    sort_items(config, items)
+    sorter.assert_called_once()
+    assert [item.name for item in items] == ["test_c", "test_b", "test_a"]
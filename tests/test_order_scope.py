@@ -132,3 +132,227 @@ def test_invalid_scope(fixture_path):
     result.stdout.fnmatch_lines(
         ["*UserWarning: Unknown order scope 'function', ignoring it.*"]
     )
+
+
+def test_relative_marks_outside_of_scope(test_path):
+    test_path.makepyfile(
+        test_module1=(
+            """
+            import pytest
+
+            @pytest.mark.order(after="test_module2.py::test_b")
+            def test_a():
+                assert True
+
+            def test_b():
+                assert True
+            """
+        ),
+        test_module2=(
+            """
+            import pytest
+
+            def test_a():
+                assert True
+
+            @pytest.mark.order(before="test_module1.py::test_a")
+            def test_b():
+                assert True
+            """
+        ),
+    )
+    result = test_path.runpytest("-v", "--order-scope=module")
+    result.assert_outcomes(passed=4, failed=0)
+    result.stdout.fnmatch_lines(
+        [
+            "test_module1.py::test_a PASSED",
+            "test_module1.py::test_b PASSED",
+            "test_module2.py::test_a PASSED",
+            "test_module2.py::test_b PASSED",
+        ]
+    )
+    warning = (
+        "WARNING: cannot execute tests relative to tests outside of their "
+        "order scope: test_module1.py::test_a test_module2.py::test_b "
+        "- ignoring the markers."
+    )
+    assert result.stdout.str().count(warning) == 1
+
+    result = test_path.runpytest("-v")
+    result.assert_outcomes(passed=4, failed=0)
+    result.stdout.fnmatch_lines(
+        [
+            "test_module2.py::test_b PASSED",
+            "test_module1.py::test_a PASSED",
+            "test_module1.py::test_b PASSED",
+            "test_module2.py::test_a PASSED",
+        ]
+    )
+    assert "outside of their order scope" not in result.stdout.str()
+
+
+def test_modules_without_marks_are_not_sorted(test_path, mocker):
+    from pytest_order.sorter import ScopeSorter
+
+    scope_sorter = mocker.patch("pytest_order.sorter.ScopeSorter", wraps=ScopeSorter)
+    test_path.makepyfile(
+        test_module1=(
+            """
+            def test_b():
+                assert True
+
+            def test_a():
+                assert True
+            """
+        ),
+        test_module2=(
+            """
+            import pytest
+
+            def test_a():
+                assert True
+
+            @pytest.mark.order(0)
+            def test_b():
+                assert True
+            """
+        ),
+    )
+    result = test_path.runpytest("-v", "--order-scope=module")
+    result.assert_outcomes(passed=4, failed=0)
+    result.stdout.fnmatch_lines(
+        [
+            "test_module1.py::test_b PASSED",
+            "test_module1.py::test_a PASSED",
+            "test_module2.py::test_b PASSED",
+            "test_module2.py::test_a PASSED",
+        ]
+    )
+    assert scope_sorter.call_count == 1
+
+
+def test_order_stats(test_path):
+    test_path.makepyfile(
+        test_module1=(
+            """
+            def test_a():
+                assert True
+            """
+        ),
+        test_module2=(
+            """
+            import pytest
+
+            def test_a():
+                assert True
+
+            @pytest.mark.order(after="test_a")
+            def test_b():
+                assert True
+            """
+        ),
+        test_module3=(
+            """
+            import pytest
+
+            @pytest.mark.order(after="test_b")
+            def test_a():
+                assert True
+
+            def test_b():
+                assert True
+            """
+        ),
+        test_module4=(
+            """
+            import pytest
+
+            def test_a():
+                assert True
+
+            @pytest.mark.order(0)
+            def test_b():
+                assert True
+            """
+        ),
+    )
+    result = test_path.runpytest("-v", "--order-scope=module", "--order-stats")
+    result.assert_outcomes(passed=7, failed=0)
+    result.stdout.fnmatch_lines(
+        [
+            "pytest-order: 7 tests in 4 scope groups: 1 without markers, "
+            "1 already in order, 1 sorted by relative markers, "
+            "1 sorted by ordinals.",
+            "test_module1.py::test_a PASSED",
+            "test_module2.py::test_a PASSED",
+            "test_module2.py::test_b PASSED",
+            "test_module3.py::test_b PASSED",
+            "test_module3.py::test_a PASSED",
+            "test_module4.py::test_b PASSED",
+            "test_module4.py::test_a PASSED",
+        ]
+    )
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_order_workers(test_path, workers):
+    for index in range(3):
+        test_path.makepyfile(
+            **{
+                f"test_module{index}": (
+                    """
+                    import pytest
+
+                    @pytest.mark.order(after="test_b")
+                    def test_a():
+                        assert True
+
+                    @pytest.mark.order(after="test_c")
+                    def test_b():
+                        assert True
+
+                    @pytest.mark.order(after="test_a")
+                    def test_c():
+                        assert True
+
+                    @pytest.mark.order(0)
+                    def test_d():
+                        assert True
+                    """
+                    if index == 1
+                    else """
+                    import pytest
+
+                    @pytest.mark.order(after="test_b")
+                    def test_a():
+                        assert True
+
+                    def test_b():
+                        assert True
+                    """
+                )
+            }
+        )
+    result = test_path.runpytest(
+        "-v", "--order-scope=module", f"--order-workers={workers}", "--order-stats"
+    )
+    result.assert_outcomes(passed=8, failed=0)
+    result.stdout.fnmatch_lines(
+        [
+            "WARNING: cannot execute test relative to others: "
+            "test_module1.py::test_b test_module1.py::test_c "
+            "test_module1.py::test_a.",
+            "WARNING: constraint cycle: test_module1.py::test_b -[after]-> "
+            "test_module1.py::test_a -[after]-> test_module1.py::test_c "
+            "-[after]-> test_module1.py::test_b",
+            "pytest-order: 8 tests in 3 scope groups: 3 sorted by relative markers.",
+            "test_module0.py::test_b PASSED",
+            "test_module0.py::test_a PASSED",
+            "test_module1.py::test_d PASSED",
+            "test_module1.py::test_a PASSED",
+            "test_module1.py::test_c PASSED",
+            "test_module1.py::test_b PASSED",
+            "test_module2.py::test_b PASSED",
+            "test_module2.py::test_a PASSED",
+        ]
+    )
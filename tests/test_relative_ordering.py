@@ -83,6 +83,47 @@ def test_relative3(item_names_for):
     ]
 
 
+def test_relative_after_and_before_same_test(item_names_for):
+    test_content = """
+        import pytest
+
+        @pytest.mark.order(after="test_1")
+        def test_0():
+            pass
+
+        def test_1():
+            pass
+
+        @pytest.mark.order(before="test_0")
+        def test_2():
+            pass
+        """
+    assert item_names_for(test_content) == ["test_2", "test_1", "test_0"]
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_relative_to_ordered_test(item_names_for, ignore_settings, sparse):
+    ignore_settings.return_value.sparse_ordering = sparse
+    test_content = """
+        import pytest
+
+        def test_0():
+            pass
+
+        @pytest.mark.order(after="test_2")
+        def test_1():
+            pass
+
+        def test_2():
+            pass
+
+        @pytest.mark.order(0, after="test_1")
+        def test_3():
+            pass
+        """
+    assert item_names_for(test_content) == ["test_2", "test_1", "test_3", "test_0"]
+
+
 def test_relative_in_class(item_names_for):
     tests_content = """
         import pytest
@@ -642,3 +683,386 @@ def test_dependency_on_parametrized_test(item_names_for):
         "test_2[ddddd]",
         "test_1",
     ]
+
+
+def test_before_chain_keeps_other_tests_in_place(item_names_for):
+    test_content = """
+        import pytest
+
+        def test_1():
+            pass
+
+        def test_2():
+            pass
+
+        @pytest.mark.order(before="test_1")
+        def test_3():
+            pass
+
+        def test_4():
+            pass
+
+        @pytest.mark.order(before="test_3")
+        def test_5():
+            pass
+
+        @pytest.mark.order(after="test_1")
+        def test_6():
+            pass
+        """
+    assert item_names_for(test_content) == [
+        "test_5",
+        "test_3",
+        "test_1",
+        "test_2",
+        "test_4",
+        "test_6",
+    ]
+
+
+def test_chained_after_markers_keep_baseline_position(item_names_for):
+    # test_6 is placed directly in front of test_2, and test_1
+    # is placed at its own position as soon as test_3 has run
+    test_content = """
+        import pytest
+
+        @pytest.mark.order(after="test_3")
+        def test_1():
+            pass
+
+        @pytest.mark.order(after="test_1")
+        def test_2():
+            pass
+
+        def test_3():
+            pass
+
+        def test_4():
+            pass
+
+        def test_5():
+            pass
+
+        @pytest.mark.order(before="test_2")
+        def test_6():
+            pass
+        """
+    assert item_names_for(test_content) == [
+        "test_6",
+        "test_3",
+        "test_1",
+        "test_2",
+        "test_4",
+        "test_5",
+    ]
+
+
+def test_chained_before_markers_keep_baseline_position(item_names_for):
+    # test_3 is placed directly in front of test_1, before test_2,
+    # and test_1 follows as soon as test_4 has run after test_2
+    test_content = """
+        import pytest
+
+        @pytest.mark.order(after="test_4")
+        def test_1():
+            pass
+
+        def test_2():
+            pass
+
+        @pytest.mark.order(before="test_1")
+        def test_3():
+            pass
+
+        @pytest.mark.order(after="test_2")
+        def test_4():
+            pass
+
+        def test_5():
+            pass
+
+        def test_6():
+            pass
+        """
+    assert item_names_for(test_content) == [
+        "test_3",
+        "test_2",
+        "test_4",
+        "test_1",
+        "test_5",
+        "test_6",
+    ]
+
+
+def test_constraint_cycle_is_reported(test_path):
+    test_path.makepyfile(
+        test_cycle="""
+        import pytest
+
+        @pytest.mark.dependency()
+        @pytest.mark.order(after="test_3")
+        def test_1():
+            pass
+
+        def test_2():
+            pass
+
+        @pytest.mark.dependency(depends=["test_1"])
+        def test_3():
+            pass
+
+        @pytest.mark.order(before="test_2")
+        def test_4():
+            pass
+        """
+    )
+    result = test_path.runpytest("-v", "--order-dependencies")
+    result.assert_outcomes(passed=4)
+    result.stdout.fnmatch_lines(
+        [
+            "WARNING: constraint cycle: test_cycle.py::test_3 -[after]-> "
+            "test_cycle.py::test_1 -[dependency]-> test_cycle.py::test_3",
+        ]
+    )
+    result.stdout.no_fnmatch_line("*test_4*constraint cycle*")
+
+
+def test_constraint_cycle_keeps_position(test_path):
+    test_path.makepyfile(
+        test_c="""
+        import pytest
+
+        @pytest.mark.order(after="test_b")
+        def test_a():
+            pass
+
+        @pytest.mark.order(after="test_a")
+        def test_b():
+            pass
+
+        def test_1():
+            pass
+
+        def test_2():
+            pass
+
+        def test_3():
+            pass
+
+        def test_4():
+            pass
+        """,
+        test_d="""
+        def test_other():
+            pass
+        """,
+    )
+    result = test_path.runpytest("-v")
+    result.assert_outcomes(passed=7)
+    result.stdout.fnmatch_lines(
+        [
+            "WARNING: cannot execute test relative to others: "
+            "test_c.py::test_b test_c.py::test_a.",
+            "WARNING: constraint cycle: test_c.py::test_b -[after]-> "
+            "test_c.py::test_a -[after]-> test_c.py::test_b",
+            "test_c.py::test_a PASSED",
+            "test_c.py::test_b PASSED",
+            "test_c.py::test_1 PASSED",
+            "test_c.py::test_2 PASSED",
+            "test_c.py::test_3 PASSED",
+            "test_c.py::test_4 PASSED",
+            "test_d.py::test_other PASSED",
+        ]
+    )
+
+
+def test_minimal_cycle_breaking(test_path):
+    test_path.makepyfile(
+        test_failed_ordering="""
+        import pytest
+
+        @pytest.mark.order(after="test_3")
+        def test_1():
+            pass
+
+        @pytest.mark.order(1)
+        def test_2():
+            pass
+
+        @pytest.mark.order(before="test_1")
+        def test_3():
+            pass
+
+        @pytest.mark.order(after="test_1", before="test_3")
+        def test_4():
+            pass
+        """
+    )
+    result = test_path.runpytest(
+        "-v", "--error-on-failed-ordering", "--minimal-cycle-breaking"
+    )
+    result.assert_outcomes(passed=3, errors=1)
+    result.stdout.fnmatch_lines(
+        [
+            "WARNING: cannot execute test relative to others: "
+            "test_failed_ordering.py::test_4 - ignoring the marker.",
+            "test_failed_ordering.py::test_2 PASSED",
+            "test_failed_ordering.py::test_3 PASSED",
+            "test_failed_ordering.py::test_1 PASSED",
+            "test_failed_ordering.py::test_4 ERROR",
+        ]
+    )
+
+
+def test_minimal_cycle_breaking_keeps_dependencies(test_path):
+    test_path.makepyfile(
+        test_cycle="""
+        import pytest
+
+        @pytest.mark.dependency()
+        @pytest.mark.order(after="test_3")
+        def test_1():
+            pass
+
+        def test_2():
+            pass
+
+        @pytest.mark.dependency(depends=["test_1"])
+        def test_3():
+            pass
+        """
+    )
+    result = test_path.runpytest(
+        "-v", "--order-dependencies", "--minimal-cycle-breaking"
+    )
+    result.assert_outcomes(passed=3)
+    result.stdout.fnmatch_lines(
+        [
+            "WARNING: cannot execute test relative to others: test_cycle.py::test_1.",
+            "test_cycle.py::test_1 PASSED",
+            "test_cycle.py::test_2 PASSED",
+            "test_cycle.py::test_3 PASSED",
+        ]
+    )
+
+
+def test_relative_directory_labels(test_path):
+    test_path.makepyfile(
+        test_top=(
+            """
+            import pytest
+
+            @pytest.mark.order(after="sub/test_b.py::test_2")
+            def test_1():
+                pass
+            """
+        )
+    )
+    test_path.mkpydir("sub")
+    test_path.tmpdir.join("sub", "test_a.py").write(
+        dedent(
+            """
+            import pytest
+
+            @pytest.mark.order(after="test_b.py::test_1")
+            def test_1():
+                pass
+            """
+        )
+    )
+    test_path.tmpdir.join("sub", "test_b.py").write(
+        dedent(
+            """
+            def test_1():
+                pass
+
+            def test_2():
+                pass
+            """
+        )
+    )
+    result = test_path.runpytest("-v")
+    result.assert_outcomes(passed=4, failed=0)
+    result.stdout.fnmatch_lines(
+        [
+            "sub/test_b.py::test_1 PASSED",
+            "sub/test_a.py::test_1 PASSED",
+            "sub/test_b.py::test_2 PASSED",
+            "test_top.py::test_1 PASSED",
+        ]
+    )
+
+
+def test_class_label(item_names_for):
+    test_content = """
+        import pytest
+
+        @pytest.mark.order(after="TestB")
+        class TestA:
+            def test_1(self):
+                pass
+
+            def test_2(self):
+                pass
+
+        class TestB:
+            def test_1(self):
+                pass
+
+            def test_2(self):
+                pass
+        """
+    assert item_names_for(test_content) == [
+        "TestB::test_1",
+        "TestB::test_2",
+        "TestA::test_1",
+        "TestA::test_2",
+    ]
+
+
+def test_label_matches_whole_components(item_names_for, capsys):
+    test_content = """
+        import pytest
+
+        @pytest.mark.order(after="whole_components.py::test_2")
+        def test_1():
+            pass
+
+        def test_2():
+            pass
+        """
+    assert item_names_for(test_content) == ["test_1", "test_2"]
+    out, err = capsys.readouterr()
+    assert (
+        "cannot execute 'test_1' relative to others: "
+        "'whole_components.py::test_2' - ignoring the marker" in out
+    )
+
+
+def test_labels_for_parameter_ids_with_colons(item_names_for, capsys):
+    test_content = """
+        import pytest
+
+        @pytest.mark.order(after="test_2")
+        def test_1():
+            pass
+
+        @pytest.mark.parametrize("arg", ["a::b", "c::test_1"])
+        def test_2(arg):
+            pass
+
+        @pytest.mark.order(before="test_2[a::b]")
+        def test_3():
+            pass
+        """
+    assert item_names_for(test_content) == [
+        "test_2[a::b]",
+        "test_2[c::test_1]",
+        "test_1",
+        "test_3",
+    ]
+    out, err = capsys.readouterr()
+    assert (
+        "cannot execute 'test_3' relative to others: 'test_2[a::b]' "
+        "- ignoring the marker" in out
+    )
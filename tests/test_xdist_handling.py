@@ -1,6 +1,7 @@
 from textwrap import dedent
 
 import pytest
+
 import pytest_order
 
 
@@ -67,3 +68,72 @@ def test_xdist_ordering(tmpdir):
     args = ["-n3", f"--rootdir={tmpdir}", str(tmpdir)]
     ret = pytest.main(args, [pytest_order])
     assert ret == 1
+
+
+def write_connected_tests(tmpdir):
+    for index in range(4):
+        testname = str(tmpdir.join(f"test_module{index}.py"))
+        with open(testname, "w") as fi:
+            fi.write(
+                dedent(
+                    """
+                import os
+
+                import pytest
+
+                pid = None
+
+                def test_free():
+                    pass
+
+                def test_first():
+                    global pid
+                    pid = os.getpid()
+
+                def test_other_free():
+                    pass
+
+                @pytest.mark.order(after="test_first")
+                def test_second():
+                    assert pid == os.getpid()
+
+                @pytest.mark.order(after="test_second")
+                def test_third():
+                    assert pid == os.getpid()
+                """
+                )
+            )
+
+
+def test_xdist_order_dist(tmpdir):
+    write_connected_tests(tmpdir)
+    # With `--order-dist`, the connected tests run on the same worker
+    args = ["-n3", "--order-dist", f"--rootdir={tmpdir}", str(tmpdir)]
+    ret = pytest.main(args)
+    assert ret == 0
+
+    # Without it, they are distributed to different workers
+    args = ["-n3", f"--rootdir={tmpdir}", str(tmpdir)]
+    ret = pytest.main(args)
+    assert ret == 1
+
+
+def test_xdist_order_dist_without_plan(tmpdir, capsys):
+    write_connected_tests(tmpdir)
+    # workers running in another directory cannot share the order plan,
+    # so the tests are distributed by module
+    workers = tmpdir.mkdir("workers")
+    args = [
+        "--order-dist",
+        "--dist=load",
+        f"--tx=3*popen//chdir={workers}",
+        f"--rsyncdir={tmpdir}",
+        f"--rootdir={tmpdir}",
+        str(tmpdir),
+    ]
+    ret = pytest.main(args)
+    assert ret == 0
+    assert (
+        "WARNING: no order plan written by the xdist workers - "
+        "distributing the tests by module and class." in capsys.readouterr().out
+    )